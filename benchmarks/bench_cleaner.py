@@ -0,0 +1,66 @@
+# Checks MarkdownCleaner against the original six-pass clean_ai_response and times both
+# Usage: python benchmarks/bench_cleaner.py
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine import clean_ai_response, MarkdownCleaner
+
+# --- Original implementation, kept here as the baseline ---
+def legacy_clean_ai_response(text):
+    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # **bold**
+    text = re.sub(r'\*([^*]+)\*', r'\1', text)        # *italic*
+    text = re.sub(r'`([^`]+)`', r'\1', text)           # `code`
+    text = re.sub(r'#+\s*', '', text)                  # # headers
+    text = re.sub(r'\*', '', text)                     # stray stars
+    text = re.sub(r'\s*\n\s*', '\n', text)          # clean up newlines
+    return text.strip()
+
+def load_replies():
+    with open(os.path.join(ROOT, "benchmarks", "data", "recorded_replies.json")) as f:
+        return json.load(f)
+
+def stream_clean(text, rng):
+    cleaner = MarkdownCleaner()
+    out = []
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, 12)  # Roughly token-sized chunks
+        out.append(cleaner.feed(text[pos:pos + size]))
+        pos += size
+    out.append(cleaner.finish())
+    return "".join(out)
+
+def timed(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    rng = random.Random(42)
+    replies = load_replies()
+    mismatches = 0
+    for reply in replies:
+        expected = legacy_clean_ai_response(reply)
+        if clean_ai_response(reply) != expected or stream_clean(reply, rng) != expected:
+            mismatches += 1
+            print("MISMATCH:", repr(reply[:60]))
+    print(f"recorded replies: {len(replies)}, mismatches: {mismatches}")
+    corpus = "\n\n".join(replies)
+    for target in (1000, 10000, 50000):
+        text = (corpus * (target // len(corpus) + 1))[:target]
+        repeat = max(20, 200000 // target)
+        legacy = timed(legacy_clean_ai_response, text, repeat)
+        single = timed(clean_ai_response, text, repeat)
+        print(f"{len(text):>6} chars  legacy={legacy * 1000:7.3f} ms  new={single * 1000:7.3f} ms  speedup={legacy / single:4.2f}x")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
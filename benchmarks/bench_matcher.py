@@ -0,0 +1,106 @@
+# Micro-benchmark: single-pass KeywordMatcher vs. the original per-keyword substring scans
+# Usage: python benchmarks/bench_matcher.py [--messages N] [--vocab N]
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import COMMON_SUBJECTS, GENERIC_WORDS, QUIZ_KEYWORDS, EXPLAIN_KEYWORDS, SUMMARY_KEYWORDS, HELP_KEYWORDS
+from matcher import KeywordMatcher
+
+# --- Original implementations, kept here as the baseline ---
+def legacy_extract_subject(text, subjects):
+    text_lower = text.lower()
+    for subject in subjects:
+        if subject in text_lower:
+            return subject.capitalize()
+    words = re.findall(r'\b\w+\b', text_lower)
+    candidates = [w for w in words if w not in GENERIC_WORDS]
+    if candidates:
+        return candidates[-1].capitalize()
+    return None
+
+def legacy_detect_intent(text):
+    text = text.lower()
+    if any(word in text for word in QUIZ_KEYWORDS):
+        return "quiz"
+    if any(word in text for word in EXPLAIN_KEYWORDS):
+        return "explain"
+    if any(word in text for word in SUMMARY_KEYWORDS):
+        return "summary"
+    if any(word in text for word in HELP_KEYWORDS):
+        return "help"
+    return None
+
+def make_matcher(subjects):
+    matcher = KeywordMatcher()
+    matcher.add("subject", subjects)
+    matcher.add("intent", QUIZ_KEYWORDS, label="quiz")
+    matcher.add("intent", EXPLAIN_KEYWORDS, label="explain")
+    matcher.add("intent", SUMMARY_KEYWORDS, label="summary")
+    matcher.add("intent", HELP_KEYWORDS, label="help")
+    return matcher
+
+def classify(matcher, text):
+    # Same logic as engine.classify_message, against a matcher with a custom vocabulary
+    text_lower = text.lower()
+    subject = intent = None
+    for kind, label, rank in matcher.scan(text_lower):
+        if kind == "subject" and (subject is None or rank < subject[0]):
+            subject = (rank, label)
+        elif kind == "intent" and (intent is None or rank < intent[0]):
+            intent = (rank, label)
+    if subject is None:
+        candidates = [w for w in re.findall(r'\b\w+\b', text_lower) if w not in GENERIC_WORDS]
+        subject = candidates[-1] if candidates else None
+    return subject, intent
+
+def synthetic_vocab(n, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocab = set(COMMON_SUBJECTS)
+    while len(vocab) < n:
+        words = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(rng.randint(1, 3))]
+        vocab.add(" ".join(words))
+    return list(vocab)
+
+def synthetic_messages(n, vocab, rng):
+    fillers = ["can", "you", "please", "explain", "start", "teaching", "me", "about", "the", "history", "of",
+               "quiz", "summary", "tips", "for", "my", "exam", "tomorrow", "understand", "questions"]
+    messages = []
+    for _ in range(n):
+        words = [rng.choice(fillers) for _ in range(rng.randint(5, 25))]
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words)), rng.choice(vocab))
+        messages.append(" ".join(words))
+    return messages
+
+def timed(fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--vocab", type=int, default=20000)
+    args = parser.parse_args()
+    rng = random.Random(1234)
+    for vocab_size in (len(COMMON_SUBJECTS), args.vocab):
+        vocab = COMMON_SUBJECTS if vocab_size == len(COMMON_SUBJECTS) else synthetic_vocab(vocab_size, rng)
+        messages = synthetic_messages(args.messages, vocab, rng)
+        start = time.perf_counter()
+        matcher = make_matcher(vocab)
+        matcher.compile()
+        compile_time = time.perf_counter() - start
+        legacy = timed(lambda m: (legacy_extract_subject(m, vocab), legacy_detect_intent(m)), messages)
+        single = timed(lambda m: classify(matcher, m), messages)
+        print(f"vocab={len(vocab):>6} messages={len(messages)}  legacy={legacy * 1000:8.1f} ms  "
+              f"single-pass={single * 1000:8.1f} ms  speedup={legacy / single:6.1f}x  (compile {compile_time * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# In-process stand-in for the OpenAI SDK clients, for benchmarks that shouldn't measure sockets
+# FakeBackend decides each call's outcome from a seeded RNG (same seed, same sequence of failures)
+# and serves the mock server's canned replies, so the app's parsers see realistic text:
+#   backend = FakeBackend(latency=0.2, error_rate=0.1, seed=7)
+#   backend = FakeBackend(models={"slow-model": {"latency": 1.0, "slow_rate": 0.1}})  # per-model overrides
+#   transport = Transport("fake", "key", client=backend.client(), async_client=backend.async_client())
+# Errors are real SDK exceptions, so the transport's retries, breaker and describe_error behave as
+# they would against the network.
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_openrouter import reply_for
+
+FAKE_URL = "http://fake-openrouter/api/v1/chat/completions"
+
+
+def _usage(prompt, content):
+    return SimpleNamespace(prompt_tokens=len(prompt) // 4 + 1, completion_tokens=len(content) // 4 + 1)
+
+
+def _error(status):
+    request = httpx.Request("POST", FAKE_URL)
+    if status is None:
+        return openai.APIConnectionError(request=request)
+    response = httpx.Response(status, request=request)
+    return openai.APIStatusError("fake upstream error", response=response, body=None)
+
+
+class FakeBackend:
+    def __init__(self, latency=0.05, chunk_delay=0.0, chunk_size=16, error_rate=0.0, error_status=429,
+                 drop_rate=0.0, slow_rate=0.0, slow_latency=2.0, models=None, seed=0, reply=reply_for):
+        self.latency = latency  # Seconds before the response (or the first chunk)
+        self.slow_rate = slow_rate  # Fraction of calls that take slow_latency instead (a queued request)
+        self.slow_latency = slow_latency
+        self.models = models or {}  # {model: {setting: value}} overriding the settings above per model
+        self.chunk_delay = chunk_delay  # Seconds between streamed chunks
+        self.chunk_size = chunk_size  # Characters per streamed chunk
+        self.error_rate = error_rate  # Fraction of calls failing up front with error_status (None: connection error)
+        self.error_status = error_status
+        self.drop_rate = drop_rate  # Fraction of streams cut off halfway with a connection error
+        self.reply = reply  # reply(prompt) -> completion text
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.calls_by_model = {}
+
+    def client(self):
+        return FakeOpenAI(self)
+
+    def async_client(self):
+        return AsyncFakeOpenAI(self)
+
+    def setting(self, model, name):
+        return self.models.get(model, {}).get(name, getattr(self, name))
+
+    def plan(self, kwargs):
+        # (prompt, content, latency, pieces, fail, drop_at) for one call
+        model = kwargs.get("model")
+        prompt = kwargs["messages"][-1]["content"]
+        content = self.reply(prompt)
+        with self.lock:
+            self.calls += 1
+            self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+            slow = self.rng.random() < self.setting(model, "slow_rate")
+            fail = self.rng.random() < self.setting(model, "error_rate")
+            drop = kwargs.get("stream") and self.rng.random() < self.setting(model, "drop_rate")
+            if fail or drop:
+                self.errors += 1
+        latency = self.setting(model, "slow_latency" if slow else "latency")
+        pieces = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)]
+        return prompt, content, latency, pieces, fail, len(pieces) // 2 if drop else None
+
+    def completion(self, prompt, content):
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+                               usage=_usage(prompt, content))
+
+    def chunk(self, piece):
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=piece))], usage=None)
+
+    def usage_chunk(self, prompt, content):
+        return SimpleNamespace(choices=[], usage=_usage(prompt, content))
+
+
+class _Completions:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, **kwargs):
+        backend = self.backend
+        prompt, content, latency, pieces, fail, drop_at = backend.plan(kwargs)
+        time.sleep(latency)
+        if fail:
+            raise _error(backend.setting(kwargs.get("model"), "error_status"))
+        if not kwargs.get("stream"):
+            return backend.completion(prompt, content)
+        return FakeStream(self._stream(kwargs, prompt, content, pieces, drop_at))
+
+    def _stream(self, kwargs, prompt, content, pieces, drop_at):
+        backend = self.backend
+        for i, piece in enumerate(pieces):
+            if i == drop_at:
+                raise _error(None)
+            if i and backend.chunk_delay:
+                time.sleep(backend.chunk_delay)
+            yield backend.chunk(piece)
+        if (kwargs.get("stream_options") or {}).get("include_usage"):
+            yield backend.usage_chunk(prompt, content)
+
+
+class _AsyncCompletions:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def create(self, **kwargs):
+        backend = self.backend
+        prompt, content, latency, pieces, fail, drop_at = backend.plan(kwargs)
+        await asyncio.sleep(latency)
+        if fail:
+            raise _error(backend.setting(kwargs.get("model"), "error_status"))
+        if not kwargs.get("stream"):
+            return backend.completion(prompt, content)
+        return AsyncFakeStream(self._stream(kwargs, prompt, content, pieces, drop_at))
+
+    async def _stream(self, kwargs, prompt, content, pieces, drop_at):
+        backend = self.backend
+        for i, piece in enumerate(pieces):
+            if i == drop_at:
+                raise _error(None)
+            if i and backend.chunk_delay:
+                await asyncio.sleep(backend.chunk_delay)
+            yield backend.chunk(piece)
+        if (kwargs.get("stream_options") or {}).get("include_usage"):
+            yield backend.usage_chunk(prompt, content)
+
+
+class FakeStream:
+    # Like the SDK's Stream: iterable, with close() to drop the response early
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return self.chunks
+
+    def close(self):
+        self.chunks.close()
+
+
+class AsyncFakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self.chunks
+
+    async def close(self):
+        await self.chunks.aclose()
+
+
+class FakeOpenAI:
+    def __init__(self, backend):
+        self.chat = SimpleNamespace(completions=_Completions(backend))
+
+    def close(self):
+        pass
+
+
+class AsyncFakeOpenAI:
+    def __init__(self, backend):
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(backend))
+
+    async def close(self):
+        pass
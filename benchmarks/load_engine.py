@@ -0,0 +1,72 @@
+# Load test: many concurrent sessions on one MindMate engine, against the local mock server
+# Each session chats, takes a quiz (answering every question) and fetches a to-do list.
+# Usage: python benchmarks/load_engine.py [--sessions N] [--concurrency N] [--latency S] [--error-rate F]
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MindMate
+from metrics import percentile
+from mock_openrouter import MockOpenRouter
+from transport import Transport, RetryPolicy, CircuitBreaker
+
+SUBJECTS = ["Physics", "Chemistry", "Biology", "History", "Python", "Algebra"]
+
+async def run_session(engine, i, timings):
+    session_id = f"load-{i}"
+    subject = SUBJECTS[i % len(SUBJECTS)]
+    steps = [
+        ("chat", lambda: engine.chat(session_id, f"Can you explain the basics of {subject.lower()}?")),
+        ("quiz", lambda: engine.generate_quiz(session_id, subject)),
+        ("todo", lambda: engine.generate_todo(session_id, subject)),
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        result = await step()
+        timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        if name == "chat" and result["error"]:
+            raise RuntimeError(result["error"])
+        if name == "quiz":
+            for q in result:
+                await engine.answer_question(session_id, q["answer"])
+    engine.end_session(session_id)
+
+async def run(args, base_url):
+    transport = Transport(
+        base_url, "mock-key", pool_size=args.concurrency,
+        retry=RetryPolicy(4, 0.05, 0.5), breaker=CircuitBreaker(failure_threshold=10 ** 6),
+    )
+    engine = MindMate(transport=transport, cache=None, bank=None, max_concurrency=args.concurrency)
+    timings = {}
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_session(engine, i, timings) for i in range(args.sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    await transport.async_client.close()
+    transport.close()
+    failed = [r for r in results if isinstance(r, Exception)]
+    return elapsed, timings, failed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="upstream requests in flight at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock time to first byte, seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    with MockOpenRouter(latency=args.latency, chunk_delay=args.chunk_delay, error_rate=args.error_rate) as mock:
+        elapsed, timings, failed = asyncio.run(run(args, mock.base_url))
+        requests = mock.config.requests
+    print(f"sessions={args.sessions} concurrency={args.concurrency}  {elapsed:.2f} s  "
+          f"{args.sessions / elapsed:.1f} sessions/s  upstream requests={requests}  failed sessions={len(failed)}")
+    for name, values in timings.items():
+        print(f"  {name:<5} n={len(values):>5}  p50={percentile(values, 50):8.1f} ms  p95={percentile(values, 95):8.1f} ms")
+    for error in failed[:3]:
+        print(f"  error: {error!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# Benchmark suite: hot paths, UI rebuilds, a concurrent load scenario and hedged requests against a
+# model with a slow tail, written as JSON so runs can be compared between commits
+#   python benchmarks/run_benchmarks.py --output results.json
+#   python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.25
+#   xvfb-run -a python benchmarks/run_benchmarks.py ...    (the UI timings need a display)
+# Every result is {"value", "unit", "better"}; --compare exits with status 1 when any result got
+# worse than the baseline by more than the threshold.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MINDMATE_NO_CACHE", "1")  # Never read or fill the user's response cache or question bank
+os.environ.setdefault("MINDMATE_NO_BANK", "1")
+
+from engine import MindMate, MarkdownCleaner, clean_ai_response, extract_subject, detect_intent, parse_quiz, add_subjects, COMMON_SUBJECTS
+from metrics import percentile
+from routing import ModelRoute, ModelRouter
+from mock_openrouter import QUIZ_REPLY
+from transport import Transport, RetryPolicy, CircuitBreaker
+from bench_matcher import synthetic_messages, synthetic_vocab
+from fake_openai import FakeBackend
+from load_engine import run_session
+
+CHAT_HISTORY_SIZE = 10000
+TODO_LIST_SIZE = 1000
+
+
+class Results:
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, value, unit="ms", better="lower"):
+        self.values[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"  {name:<44}{value:>12.3f} {unit}")
+
+    def skip(self, name, reason):
+        self.values[name] = {"skipped": reason}
+        print(f"  {name:<44}{'skipped':>12} ({reason})")
+
+
+def measure(fn, repeat=1, rounds=5):
+    # Median over rounds of the mean time per call, in ms
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / repeat)
+    return statistics.median(samples)
+
+
+def load_recorded_replies():
+    with open(os.path.join(ROOT, "benchmarks", "data", "recorded_replies.json")) as f:
+        return json.load(f)
+
+
+def synthetic_quiz(n, rng):
+    # Quiz text the way models actually format it: bold headers, stray blank lines, mixed case answers
+    parts = []
+    for i in range(n):
+        choices = "\n".join(f"{key}) option {rng.randint(1, 999)}" for key in "ABCD")
+        parts.append(f"**Question {i + 1}:** What is item {rng.randint(1, 999)}?\n{choices}\n**Answer:** {rng.choice('abcdABCD')}\n")
+    return "\n".join(parts)
+
+
+def stream_clean(text, chunk=8):
+    cleaner = MarkdownCleaner()
+    out = [cleaner.feed(text[i:i + chunk]) for i in range(0, len(text), chunk)]
+    out.append(cleaner.finish())
+    return "".join(out)
+
+
+def bench_hot_paths(results, args):
+    rng = random.Random(args.seed)
+    replies = load_recorded_replies()
+    corpus = "\n\n".join(replies)
+    results.add("hot.clean_ai_response.recorded", measure(lambda: [clean_ai_response(r) for r in replies], repeat=50))
+    for size in (10000, 50000):
+        text = (corpus * (size // len(corpus) + 1))[:size]
+        results.add(f"hot.clean_ai_response.synthetic_{size // 1000}k", measure(lambda: clean_ai_response(text), repeat=20))
+    text = (corpus * (10000 // len(corpus) + 1))[:10000]
+    results.add("hot.markdown_cleaner_stream.synthetic_10k", measure(lambda: stream_clean(text), repeat=10))
+
+    messages = synthetic_messages(args.messages, COMMON_SUBJECTS, rng)
+    results.add("hot.extract_subject.recorded", measure(lambda: [extract_subject(r) for r in replies], repeat=50))
+    results.add("hot.detect_intent.recorded", measure(lambda: [detect_intent(r) for r in replies], repeat=50))
+    results.add(f"hot.extract_subject.synthetic_{len(messages)}", measure(lambda: [extract_subject(m) for m in messages]))
+    results.add(f"hot.detect_intent.synthetic_{len(messages)}", measure(lambda: [detect_intent(m) for m in messages]))
+
+    results.add("hot.parse_quiz.recorded", measure(lambda: parse_quiz(QUIZ_REPLY), repeat=200))
+    quiz = synthetic_quiz(200, rng)
+    results.add("hot.parse_quiz.synthetic_200q", measure(lambda: parse_quiz(quiz), repeat=10))
+
+    # Last, since it grows the engine's vocabulary for the rest of the process
+    vocab = synthetic_vocab(20000, rng)
+    add_subjects(vocab)
+    extract_subject("warm up")  # Compiles the matcher outside the timing
+    messages = synthetic_messages(args.messages, vocab, rng)
+    results.add(f"hot.extract_subject.vocab20k_{len(messages)}", measure(lambda: [extract_subject(m) for m in messages]))
+
+
+def bench_ui(results, args):
+    names = ("ui.chat_append_10k", "ui.show_chatbot_10k", "ui.show_todo_for_subject_1k", "ui.todo_switch_subject_1k")
+    try:
+        import tkinter
+        import main
+        app = main.YourAssistantApp()
+    except (ImportError, tkinter.TclError) as e:
+        for name in names:
+            results.skip(name, f"needs a display: {type(e).__name__}")
+        return
+    try:
+        app.update()
+        for i in range(CHAT_HISTORY_SIZE):
+            sender = "You" if i % 2 == 0 else "Assistant"
+            app.append_chat(sender, f"Message {i}: explain how photosynthesis turns light into chemical energy, step by step.")
+        start = time.perf_counter()
+        app.ui.flush()
+        app.update_idletasks()
+        results.add(names[0], (time.perf_counter() - start) * 1000)
+
+        def switch_to_chat():
+            app.show_todo()
+            app.update_idletasks()
+            start = time.perf_counter()
+            app.show_chatbot()
+            app.update_idletasks()
+            return (time.perf_counter() - start) * 1000
+        results.add(names[1], statistics.median(switch_to_chat() for _ in range(5)))
+
+        for subject in ("Physics", "Chemistry"):
+            app.session.subjects.add(subject)
+            app.session.todo_lists[subject] = [{"task": f"{subject} task {i}", "done": i % 3 == 0} for i in range(TODO_LIST_SIZE)]
+        app.show_todo()
+        app.update_idletasks()
+        start = time.perf_counter()
+        app.show_todo_for_subject("Physics")
+        app.update_idletasks()
+        results.add(names[2], (time.perf_counter() - start) * 1000)
+
+        def switch_subject(subject):
+            start = time.perf_counter()
+            app.show_todo_for_subject(subject)
+            app.update_idletasks()
+            return (time.perf_counter() - start) * 1000
+        results.add(names[3], statistics.median(switch_subject(s) for s in ("Chemistry", "Physics") * 5))
+    finally:
+        app.destroy()
+
+
+def bench_load(results, args):
+    backend = FakeBackend(latency=args.latency, chunk_delay=args.chunk_delay, error_rate=args.error_rate, seed=args.seed)
+    transport = Transport(
+        "fake", "fake-key", retry=RetryPolicy(4, 0.01, 0.1), breaker=CircuitBreaker(failure_threshold=10 ** 6),
+        client=backend.client(), async_client=backend.async_client(),
+    )
+    engine = MindMate(transport=transport, cache=None, bank=None, max_concurrency=args.concurrency)
+
+    async def run():
+        timings = {}
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(run_session(engine, i, timings) for i in range(args.sessions)), return_exceptions=True)
+        return time.perf_counter() - start, timings, outcomes
+
+    elapsed, timings, outcomes = asyncio.run(run())
+    failed = sum(isinstance(o, Exception) for o in outcomes)
+    prefix = f"load.sessions_{args.sessions}"
+    results.add(f"{prefix}.throughput", args.sessions / elapsed, "sessions/s", better="higher")
+    results.add(f"{prefix}.failed", failed, "sessions")
+    results.add(f"{prefix}.upstream_calls", backend.calls, "calls")
+    for step, values in sorted(timings.items()):
+        results.add(f"{prefix}.{step}.p50", percentile(values, 50))
+        results.add(f"{prefix}.{step}.p95", percentile(values, 95))
+
+
+def bench_hedge(results, args):
+    # The same stream of to-do requests against a primary model with a slow tail, once without a
+    # fallback and once hedged with one; the hedge should cut p95 for a few percent extra calls
+    models = {"primary": {"slow_rate": args.slow_rate, "slow_latency": args.slow_latency}}
+    for label, fallback in (("primary_only", None), ("hedged", "fallback")):
+        backend = FakeBackend(latency=args.latency, models=models, seed=args.seed)
+        transport = Transport(
+            "fake", "fake-key", retry=RetryPolicy(1, 0.01, 0.1), breaker=CircuitBreaker(failure_threshold=10 ** 6),
+            client=backend.client(), async_client=backend.async_client(),
+        )
+        router = ModelRouter({"default": ModelRoute("primary", fallback)}, default_deadline=args.slow_latency / 2,
+                             min_deadline=args.latency, min_samples=20)
+        engine = MindMate(transport=transport, cache=None, bank=None, router=router, max_concurrency=args.concurrency)
+
+        async def request(i, timings):
+            start = time.perf_counter()
+            await engine.generate_todo(f"hedge{i}", f"Subject {i}")
+            timings.append((time.perf_counter() - start) * 1000)
+
+        async def run():
+            timings = []
+            for batch in range(0, args.hedge_requests, 10):
+                await asyncio.gather(*(request(i, timings) for i in range(batch, min(batch + 10, args.hedge_requests))))
+            return timings
+
+        timings = asyncio.run(run())
+        prefix = f"hedge.{label}"
+        results.add(f"{prefix}.p50", percentile(timings, 50))
+        results.add(f"{prefix}.p95", percentile(timings, 95))
+        results.add(f"{prefix}.p99", percentile(timings, 99))
+        results.add(f"{prefix}.upstream_calls", backend.calls, "calls")
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    # Returns the names of results that regressed by more than threshold (a fraction)
+    regressions = []
+    print(f"\n{'result':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, result in current.items():
+        base = baseline.get(name)
+        if "value" not in result or not base or "value" not in base:
+            continue
+        old, new = base["value"], result["value"]
+        if old:
+            change = (new - old) / old
+        else:
+            change = float("inf") if new > old else 0.0
+        worse = change > threshold if result["better"] == "lower" else change < -threshold
+        if worse:
+            regressions.append(name)
+        print(f"{name:<44}{old:>12.3f}{new:>12.3f}{change:>+8.0%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", default="hot,ui,load,hedge", help="comma-separated subset of hot,ui,load,hedge")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before a result counts as a regression")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--messages", type=int, default=2000, help="synthetic chat messages for the classifier timings")
+    parser.add_argument("--sessions", type=int, default=200, help="concurrent sessions in the load scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="engine upstream limit in the load scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake time to first token, seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--hedge-requests", type=int, default=200, help="requests in the hedging scenario")
+    parser.add_argument("--slow-rate", type=float, default=0.04, help="fraction of primary-model calls that stall")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="seconds a stalled call takes")
+    args = parser.parse_args()
+
+    results = Results()
+    sections = {"hot": bench_hot_paths, "ui": bench_ui, "load": bench_load, "hedge": bench_hedge}
+    for name in args.sections.split(","):
+        print(f"[{name}]")
+        sections[name.strip()](results, args)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": round(time.time()),
+            "args": vars(args),
+        },
+        "results": results.values,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results.values, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
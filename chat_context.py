@@ -0,0 +1,90 @@
+# Token-budgeted conversation context for multi-turn chat
+# Recent turns are sent verbatim. Once they pass fold_at of the token budget, the oldest ones are
+# folded into a rolling summary in one step, leaving only the last keep_recent turns. Folding is
+# split in two so the caller can summarize in the background, between replies: pending_fold()
+# says what to summarize, apply_fold() installs the result. build() itself never waits for a
+# summary; if the history outruns the budget before a fold lands, the oldest turns are left out of
+# that request. Between folds the prompt only grows at the end, so the system prompt, the summary
+# and every earlier turn are byte-identical from one call to the next and provider-side prompt
+# caching can reuse them.
+import threading
+
+SUMMARY_HEADER = "\n\nSummary of the conversation so far:\n"
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text; close enough for budgeting without a tokenizer
+    return len(text) // 4 + 1
+
+
+class ConversationContext:
+    def __init__(self, system_prompt, token_budget=3000, keep_recent=8, fold_at=0.75, skip=None, user_sender="You"):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget  # For summary + history + new message, not counting the system prompt
+        self.keep_recent = keep_recent  # Turns left verbatim after a fold
+        self.fold_at = fold_at  # Fraction of the budget at which a fold is due, leaving room for the turns until it lands
+        self.skip = skip or (lambda sender, message: False)  # Turns never sent, e.g. error messages
+        self.user_sender = user_sender
+        self.lock = threading.Lock()
+        self.summary = ""
+        self.summarized_upto = 0  # History entries before this position are covered by the summary
+
+    def build(self, history, user_message):
+        # history: every (sender, message) entry before user_message, in order. It must only ever be
+        # appended to between calls, since positions in it are remembered. Returns the messages list.
+        with self.lock:
+            turns = self._turns(history)
+            budget = self.token_budget - estimate_tokens(user_message)
+            # Too big (a fold still pending or failed, or huge recent turns): drop the oldest for this call only
+            while turns and self._size(turns) > budget:
+                turns.pop(0)
+            system = self.system_prompt + (SUMMARY_HEADER + self.summary if self.summary else "")
+        messages = [{"role": "system", "content": system}]
+        messages.extend({"role": role, "content": text} for _, role, text in turns)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def reset(self):
+        with self.lock:
+            self.summary = ""
+            self.summarized_upto = 0
+
+    def _turns(self, history):
+        # [(position, role, text)] for the entries not yet summarized; empty entries are replies still streaming
+        turns = []
+        for pos in range(self.summarized_upto, len(history)):
+            sender, message = history[pos]
+            if message and not self.skip(sender, message):
+                turns.append((pos, "user" if sender == self.user_sender else "assistant", message))
+        return turns
+
+    def _size(self, turns):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(text) for _, _, text in turns)
+
+    def pending_fold(self, history):
+        # (previous summary, [(role, text)] to fold into it, end position) once the history has
+        # grown past fold_at of the budget, else None. Everything but the last keep_recent turns is
+        # folded, stopping early at a reply that is still streaming.
+        with self.lock:
+            turns = self._turns(history)
+            if self._size(turns) <= self.token_budget * self.fold_at or len(turns) <= self.keep_recent:
+                return None
+            end = turns[len(turns) - self.keep_recent][0]
+            for pos in range(self.summarized_upto, end):
+                if not history[pos][1]:
+                    end = pos
+                    break
+            folded = [(role, text) for pos, role, text in turns if pos < end]
+            if not folded:
+                return None
+            return self.summary, folded, end
+
+    def apply_fold(self, previous_summary, summary, end):
+        # Installs the summary of a pending_fold(), unless the context moved on meanwhile (reset, or
+        # another fold landed first)
+        with self.lock:
+            if not summary or self.summary != previous_summary or end <= self.summarized_upto:
+                return False
+            self.summary = summary.strip()
+            self.summarized_upto = end
+            return True
@@ -0,0 +1,1028 @@
+# MindMate engine: everything that isn't UI
+# Prompts, parsers, subject/intent detection, the response cache and the OpenRouter transport live
+# here, together with MindMate, an asyncio engine with one Session object per user. The Tk app is
+# one client of it; server.py serves many sessions from a single event loop.
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from response_cache import ResponseCache
+from question_bank import QuestionBank
+from matcher import KeywordMatcher
+from metrics import Metrics, setup_logging, log
+from chat_context import ConversationContext
+from transport import Transport, RetryPolicy, CircuitBreaker, describe_error
+from routing import ModelRoute, ModelRouter, parse_route
+
+# --- DeepSeek/OpenRouter API Setup ---
+API_KEY = "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"
+API_BASE_URL = os.environ.get("MINDMATE_API_BASE_URL", "https://openrouter.ai/api/v1")  # Point at mock_openrouter.py for offline testing
+
+# Per-task model routing (see routing.py). Reasoning pays off for explanations and quiz questions;
+# to-do lists, summaries and the batch prefetch go to a fast model. Each task's other model is its
+# fallback, hedged in when the primary is slow. Override a task with e.g.
+# MINDMATE_MODEL_TODO="primary-model,fallback-model".
+REASONING_MODEL = os.environ.get("MINDMATE_REASONING_MODEL", "deepseek/deepseek-r1:free")
+FAST_MODEL = os.environ.get("MINDMATE_FAST_MODEL", "meta-llama/llama-3.3-70b-instruct:free")
+MODEL_ROUTES = {
+    "default": ModelRoute(REASONING_MODEL, FAST_MODEL),
+    "chat": ModelRoute(REASONING_MODEL, FAST_MODEL),
+    "quiz": ModelRoute(REASONING_MODEL, FAST_MODEL),
+    "todo": ModelRoute(FAST_MODEL, REASONING_MODEL),
+    "summary": ModelRoute(FAST_MODEL, REASONING_MODEL),
+    "prefetch": ModelRoute(FAST_MODEL, REASONING_MODEL),
+}
+for _task in MODEL_ROUTES:
+    if os.environ.get(f"MINDMATE_MODEL_{_task.upper()}"):
+        MODEL_ROUTES[_task] = parse_route(os.environ[f"MINDMATE_MODEL_{_task.upper()}"])
+HEDGE_DEFAULT_DEADLINE = 8.0  # Seconds before a backup request, until the primary's p95 latency is known
+HEDGE_MIN_DEADLINE = 1.5
+HEDGE_MAX_DEADLINE = 30.0
+model_router = ModelRouter(MODEL_ROUTES, HEDGE_DEFAULT_DEADLINE, HEDGE_MIN_DEADLINE, HEDGE_MAX_DEADLINE)
+EXTRA_HEADERS = {
+    "HTTP-Referer": "https://mindmate.local",
+    "X-Title": "MindMate Study Assistant",
+}
+
+API_MAX_WORKERS = 3  # Worker threads of the Tk app's request scheduler
+ENGINE_MAX_CONCURRENCY = int(os.environ.get("MINDMATE_ENGINE_CONCURRENCY", 16))  # Upstream requests in flight at once
+SESSION_IDLE_TIMEOUT = float(os.environ.get("MINDMATE_SESSION_IDLE_TIMEOUT", 3600))  # Seconds without a request before a session is dropped
+SESSION_SWEEP_INTERVAL = 60  # Idle sessions are looked for at most this often
+API_POOL_SIZE = ENGINE_MAX_CONCURRENCY  # Keep-alive connections, one per request in flight
+API_CONNECT_TIMEOUT = 10  # Seconds to establish a connection
+API_READ_TIMEOUT = 60  # Seconds to wait for the next bytes of a response (per chunk when streaming)
+API_MAX_ATTEMPTS = 4  # Tries per request on 429/5xx/connection errors, including the first
+API_RETRY_BASE_DELAY = 1.0  # Backoff before the first retry is up to this many seconds, doubling after that
+API_RETRY_MAX_DELAY = 10.0  # Longest wait between tries; a 429 asking for longer than this isn't retried
+API_BREAKER_THRESHOLD = 5  # Consecutive connection errors, timeouts or 5xx before requests fail fast
+API_BREAKER_RESET = 30  # Seconds to fail fast before letting a probe request through
+
+transport = Transport(
+    base_url=API_BASE_URL,
+    api_key=API_KEY,
+    pool_size=API_POOL_SIZE,
+    connect_timeout=API_CONNECT_TIMEOUT,
+    read_timeout=API_READ_TIMEOUT,
+    retry=RetryPolicy(API_MAX_ATTEMPTS, API_RETRY_BASE_DELAY, API_RETRY_MAX_DELAY),
+    breaker=CircuitBreaker(API_BREAKER_THRESHOLD, API_BREAKER_RESET),
+)
+
+# --- Instrumentation ---
+# MINDMATE_LOG_LEVEL=INFO logs every API call, DEBUG adds raw responses and UI timings.
+# MINDMATE_METRICS_PATH=metrics.jsonl also appends every event to that file.
+METRICS_PATH = os.environ.get("MINDMATE_METRICS_PATH") or None
+setup_logging()
+metrics = Metrics(METRICS_PATH)
+
+# Seconds a request spent queued before it reached the engine (e.g. in the Tk app's scheduler)
+_queue_wait = contextvars.ContextVar("mindmate_queue_wait", default=0.0)
+
+async def with_queue_wait(coro, wait):
+    _queue_wait.set(wait or 0.0)
+    return await coro
+
+def start_call(kind, **fields):
+    # Record for one API call; queue_wait_ms is filled in once it gets an upstream slot
+    return metrics.call(kind, **fields)
+
+# --- Response cache for quiz/to-do generation ---
+CACHE_PATH = os.environ.get("MINDMATE_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".mindmate_cache.sqlite3"))
+CACHE_TTL_SECONDS = 7 * 24 * 3600  # Cached quizzes/to-do lists expire after a week
+CACHE_MAX_ENTRIES = 500  # Least recently used responses are evicted past this
+CACHE_ENABLED = os.environ.get("MINDMATE_NO_CACHE") is None
+
+# --- Question bank: every generated quiz question, reviewed with spaced repetition ---
+BANK_PATH = os.environ.get("MINDMATE_BANK_PATH", os.path.join(os.path.expanduser("~"), ".mindmate_questions.sqlite3"))
+BANK_ENABLED = os.environ.get("MINDMATE_NO_BANK") is None
+QUIZ_LENGTH = 4  # Questions per quiz
+AVOID_QUESTIONS = 10  # Most recent stored questions the model is asked not to repeat
+
+# The cache and bank files are only opened once a MindMate is built without its own, so importing
+# the engine (tests, benchmarks) leaves the user's home directory alone. Every such engine shares them.
+SHARED = object()  # Default for MindMate(cache=..., bank=...); None turns either off
+_shared_stores = {}
+
+def shared_response_cache():
+    if "cache" not in _shared_stores:
+        _shared_stores["cache"] = ResponseCache(CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES) if CACHE_ENABLED else None
+    return _shared_stores["cache"]
+
+def shared_question_bank():
+    if "bank" not in _shared_stores:
+        _shared_stores["bank"] = QuestionBank(BANK_PATH) if BANK_ENABLED else None
+    return _shared_stores["bank"]
+
+# List of common study subjects
+COMMON_SUBJECTS = [
+    "c++", "python", "java", "javascript", "html", "css", "physics", "math", "mathematics", "biology", "chemistry", "english", "history", "geography", "science", "algebra", "geometry", "calculus", "statistics", "literature", "economics", "philosophy", "art", "music", "computer science", "programming", "sql", "networking", "machine learning", "ai", "artificial intelligence", "data science", "french", "spanish", "german", "arabic", "italian", "chinese", "japanese"
+]
+
+GENERIC_WORDS = {"some", "about", "me", "a", "an", "the", "on", "in", "to", "for", "with", "of", "at", "by", "from", "and", "or", "is", "are", "was", "were", "it", "that", "this", "as", "be", "do", "does", "did"}
+
+# Simple intent keywords
+QUIZ_KEYWORDS = ["quiz", "test me", "questions", "practice questions"]
+EXPLAIN_KEYWORDS = ["explain", "explanation", "clarify", "understand"]
+SUMMARY_KEYWORDS = ["summarize", "summary", "short version"]
+HELP_KEYWORDS = ["help", "how to study", "tips", "advice", "improve", "technique"]
+
+MAX_HISTORY = 8  # Chat messages kept verbatim when older ones are folded into the running summary
+CONTEXT_TOKEN_BUDGET = 3000  # Approximate tokens of summary + chat history + new message sent with each chat request
+CONTEXT_FOLD_AT = 0.75  # Older turns are summarized (in the background, after a reply) once history passes this share of the budget
+SUMMARY_MAX_WORDS = 150
+
+PLAIN_SYSTEM_PROMPT = (
+    "You are a helpful AI study assistant. Only answer study-related questions. "
+    "Always reply in plain text. Never use any markdown, stars, hashtags, bold, or special formatting. "
+    "If you need to show a list, use numbers or dashes. If you need to show code, write it as plain text. "
+    "Be clear, direct, and easy to understand."
+)
+
+# --- Markdown cleanup for AI responses ---
+# Same steps as the original chain of six re.sub passes (bold, italic, code, headers, stray stars,
+# newlines), with headers and stray stars done in one pass. Every star is dropped in the end, but
+# the bold/italic passes still matter: a pair they remove no longer stops a header's "#+\s*" from
+# eating the whitespace after it, and no longer counts as the content of a `code` pair.
+_BOLD_RE = re.compile(r"\*\*([^*]+)\*\*")
+_ITALIC_RE = re.compile(r"\*([^*]+)\*")
+_CODE_RE = re.compile(r"`([^`]+)`")
+_MARKUP_RE = re.compile(r"[#*](?:(?<=#)#*\s*|\**)")  # "#+\s*" (a header mark) or a run of stray stars, in one pass
+_NEWLINES_RE = re.compile(r"\s*\n\s*")
+_TRAILING_MARKUP_RE = re.compile(r"[\s*#]+\Z")
+_STARS_RE = re.compile(r"\*+")
+_LAST_MARK_RE = re.compile(r"[^\s`][\s`]*\Z")  # Last character that isn't whitespace or a backtick
+MAX_HELD_CODE = 200  # Characters an unclosed single backtick may hold back while streaming before it's shown as-is
+MAX_HELD_FENCE = 4000  # Same for the last backtick of a run (a ``` fence), which usually opens a whole code block
+
+def _drop_paired_stars(text):
+    return _ITALIC_RE.sub(r"\1", _BOLD_RE.sub(r"\1", text))
+
+def _strip_markup(text):
+    return _NEWLINES_RE.sub("\n", _MARKUP_RE.sub("", text))
+
+def _drop_code_ticks(text, final=True):
+    # Remove `code` backtick pairs (leftmost first, content must be non-empty, as _CODE_RE does);
+    # other backticks stay.
+    # With final=False an unmatched backtick may still be closed later, so the text from it onwards
+    # is returned separately instead of being decided now. A single backtick is only held for
+    # MAX_HELD_CODE characters, the end of a ``` fence for MAX_HELD_FENCE; past that it's taken as a
+    # stray one and kept. (Pairing runs across blank lines around fences, so a paragraph break is
+    # no sign that a backtick is stray.)
+    parts = []
+    pos = 0
+    tick = text.find("`")
+    while tick != -1:
+        close = text.find("`", tick + 1)
+        if close == -1:
+            held = text[tick:]
+            limit = MAX_HELD_FENCE if tick and text[tick - 1] == "`" else MAX_HELD_CODE
+            if not final and len(held) <= limit:
+                parts.append(text[pos:tick])
+                return "".join(parts), held
+            break
+        if close == tick + 1:
+            tick = close  # Empty pair: the first backtick stays, the second may still open a span
+            continue
+        parts.append(text[pos:tick])
+        parts.append(text[tick + 1:close])
+        pos = close + 1
+        tick = text.find("`", pos)
+    parts.append(text[pos:])
+    return "".join(parts), ""
+
+# Function to clean up markdown, stars, hashtags, and bold from AI response
+def clean_ai_response(text):
+    return _strip_markup(_CODE_RE.sub(r"\1", _drop_paired_stars(text))).strip()
+
+# _drop_paired_stars for a stream. The bold pass pairs the last two stars of one run of stars
+# with the first two of the next run, the italic pass then does the same with one star, so each
+# run's fate is known a run or two later. Until then its stars are passed on as they are, which
+# only makes a difference for a run alone between two backticks or right after a header mark;
+# such a run (and everything after it) is held back instead, for up to MAX_HELD_CODE characters.
+class _StarPairs:
+    def __init__(self):
+        self.raw = ""  # Text not passed on yet
+        self.offset = 0  # Stream position of raw[0]
+        self.scanned = 0  # Stream position up to which runs of stars have been counted
+        self.fate = {}  # {stream position of a run: stars left after both passes, None until known}
+        self.bold_open = None  # (position, stars) of a run that may still open **...**
+        self.italic_open = None  # (position, stars) of a run left with stars that still opens *...*
+        self.prev_char = ""  # Last character passed on
+        self.after_hash = False  # Only whitespace, backticks and stars since the last header mark passed on
+
+    def feed(self, chunk, final=False):
+        if not self.raw and not final and "*" not in chunk:
+            self._pass_text([], chunk)
+            self.offset += len(chunk)
+            return chunk
+        self.raw += chunk
+        for m in _STARS_RE.finditer(self.raw, max(self.scanned - self.offset, 0)):
+            if m.end() == len(self.raw) and not final:
+                break  # The run may still grow
+            self._bold(self.offset + m.start(), len(m.group()))
+            self.scanned = self.offset + m.end()
+        if final:
+            if self.bold_open is not None:
+                self._italic(*self.bold_open)
+            if self.italic_open is not None:
+                self._settle(*self.italic_open)
+            self.bold_open = self.italic_open = None
+        parts = []
+        pos = 0
+        for m in _STARS_RE.finditer(self.raw):
+            self._pass_text(parts, self.raw[pos:m.start()])
+            pos = m.start()
+            start = self.offset + pos
+            if start not in self.fate:
+                break  # Not counted yet
+            fate = self.fate[start]
+            if fate is None and self._matters(m) and len(self.raw) - pos <= MAX_HELD_CODE:
+                break
+            del self.fate[start]
+            parts.append("" if fate == 0 else m.group())
+            self.prev_char = "*"
+            if fate:
+                self.after_hash = False
+            pos = m.end()
+        else:
+            self._pass_text(parts, self.raw[pos:])
+            pos = len(self.raw)
+        self.raw = self.raw[pos:]
+        self.offset += pos
+        return "".join(parts)
+
+    def _pass_text(self, parts, text):
+        if not text:
+            return
+        parts.append(text)
+        self.prev_char = text[-1]
+        mark = _LAST_MARK_RE.search(text)
+        if mark:
+            self.after_hash = mark.group()[0] == "#"
+
+    def _matters(self, m):
+        # Whether this run's fate changes the result: when it's all that sits between two backticks,
+        # or when a header's "#+\s*" could carry on past it
+        after = self.raw[m.end()]
+        if self.prev_char == "`" and after == "`":
+            return True
+        return self.after_hash and (after.isspace() or after in "#`")
+
+    def _bold(self, pos, stars):
+        self.fate[pos] = None
+        if self.bold_open is not None:
+            open_pos, open_stars = self.bold_open
+            self.bold_open = None
+            if stars >= 2:
+                self._italic(open_pos, open_stars - 2)
+                stars -= 2
+            else:
+                self._italic(open_pos, open_stars)
+        if stars >= 2:
+            self.bold_open = (pos, stars)
+        else:
+            self._italic(pos, stars)
+
+    def _italic(self, pos, stars):
+        # Runs reach this in order, with the stars the bold pass left them
+        if stars and self.italic_open is not None:
+            open_pos, open_stars = self.italic_open
+            self._settle(open_pos, open_stars - 1)
+            self.italic_open = None
+            stars -= 1
+        if stars:
+            self.italic_open = (pos, stars)
+        else:
+            self._settle(pos, 0)
+
+    def _settle(self, pos, stars):
+        if pos in self.fate:  # Not passed on yet
+            self.fate[pos] = stars
+
+# Incremental version of clean_ai_response for streamed replies: feed() chunks as they arrive
+# and get back cleaned text that is safe to show. Only an unclosed backtick, trailing
+# whitespace/#/* (which may still turn into a header or a newline run) and the odd run of stars
+# whose pairing isn't known yet (see _StarPairs) are held back.
+# feed(a) + feed(b) + ... + finish() == clean_ai_response(a + b + ...), except that an open
+# backtick or such a run of stars is only held back so far (see _drop_code_ticks). Past that a
+# backtick is shown as a literal one and the stars are taken as unpaired, so neither can stall the
+# stream; clean_ai_response would instead pair them with ones any distance later.
+class MarkdownCleaner:
+    def __init__(self):
+        self.stars = _StarPairs()
+        self.buffer = ""  # Text from self.stars not shown yet
+        self.started = False  # Leading whitespace is dropped until the first visible character
+        self.pending_ws = ""  # Whitespace at the end of the output so far, merged with what comes next
+
+    def feed(self, chunk):
+        self.buffer += self.stars.feed(chunk)
+        text, rest = _drop_code_ticks(self.buffer, final=False)
+        m = _TRAILING_MARKUP_RE.search(text)
+        if m:
+            text, rest = text[:m.start()], text[m.start():] + rest
+        self.buffer = rest
+        return self._emit(_strip_markup(text))
+
+    def finish(self):
+        self.buffer += self.stars.feed("", final=True)
+        text = self._emit(_strip_markup(_drop_code_ticks(self.buffer)[0]))
+        self.buffer = ""
+        self.pending_ws = ""  # Trailing whitespace is stripped
+        return text
+
+    def _emit(self, piece):
+        if not self.started:
+            piece = piece.lstrip()
+            if not piece:
+                return ""
+            self.started = True
+        if self.pending_ws:
+            body = piece.lstrip()
+            ws = self.pending_ws + piece[:len(piece) - len(body)]
+            piece = ("\n" if "\n" in ws else ws) + body
+        body = piece.rstrip()
+        self.pending_ws = piece[len(body):]
+        return body
+
+# --- Quiz parsing ---
+# Line-based and incremental: feed() streamed chunks and get back every question whose Answer:
+# line has completed. Tolerates blank lines, stars and header marks, "Question 2:"/"Q2."/"2." headings,
+# "A)"/"A."/"(A)"/"a:" choices and answers written as "Answer: B", "Answer - (b)" or
+# "Correct answer: B) the choice text".
+_QUIZ_QUESTION_RE = re.compile(r"(?:question|q)\s*\d*\s*[:.)]\s*(.*)|\d+\s*[.)]\s*(.*)", re.IGNORECASE)
+_QUIZ_CHOICE_RE = re.compile(r"\(?([A-Da-d])\s*[).:\]]\s*(.+)")
+_QUIZ_ANSWER_RE = re.compile(r"(?:correct\s+)?answer\s*[:\-]\s*\(?([A-Da-d])\b", re.IGNORECASE)  # The ":"/"-" keeps "Answer a ..." question text out
+
+class QuizStreamParser:
+    def __init__(self):
+        self.buffer = ""  # Partial last line
+        self.question = None
+        self.choices = {}
+
+    def feed(self, chunk):
+        lines = (self.buffer + chunk).split("\n")
+        self.buffer = lines.pop()
+        return self._parse_lines(lines)
+
+    def finish(self):
+        lines, self.buffer = [self.buffer], ""
+        return self._parse_lines(lines)
+
+    def _parse_lines(self, lines):
+        done = []
+        for line in lines:
+            line = line.replace("*", "").strip().lstrip("#").strip()
+            if not line:
+                continue
+            match = _QUIZ_ANSWER_RE.match(line)
+            if match:
+                answer = match.group(1).upper()
+                if self.question and answer in self.choices:
+                    done.append({"question": self.question, "choices": self.choices, "answer": answer})
+                self.question, self.choices = None, {}
+                continue
+            match = _QUIZ_CHOICE_RE.match(line)
+            if match and self.question:
+                self.choices[match.group(1).upper()] = match.group(2).strip()
+                continue
+            match = _QUIZ_QUESTION_RE.match(line)
+            if match:
+                # A new heading drops a question that never got its answer
+                self.question, self.choices = (match.group(1) or match.group(2) or "").strip(), {}
+            elif self.question is not None and not self.choices:
+                # Question text on the line after its heading, or wrapped over several lines
+                self.question = (self.question + " " + line).strip()
+        return done
+
+def quiz_prompt(subject, avoid=()):
+    prompt = (
+        f"Create a {QUIZ_LENGTH}-question multiple choice quiz about {subject}. "
+        "For each question, provide 4 answer choices (A, B, C, D) and indicate the correct answer. "
+        "Format the quiz as plain text, like this: "
+        f"Question: ...\nA) ...\nB) ...\nC) ...\nD) ...\nAnswer: ...\nRepeat for all {QUIZ_LENGTH} questions."
+    )
+    if avoid:
+        prompt += " Ask about different things than these questions: " + " | ".join(avoid)
+    return prompt
+
+def todo_prompt(subject):
+    return (
+        f"Give me a helpful, actionable to-do list for a student studying {subject}. "
+        "List 5-8 specific tasks or steps. Reply in plain text, one task per line, no numbering or bullets."
+    )
+
+def batch_prompt(subjects):
+    # One request for several subjects; the JSON reply is split back into per-subject quiz/to-do text
+    return (
+        f"Create study material for each of these subjects: {json.dumps(subjects)}. "
+        "Reply with only a JSON object, no other text. Use each subject name exactly as given as a key, "
+        "mapping to an object with two keys: "
+        "\"quiz\": a 4-question multiple choice quiz as a single string in this plain text format: "
+        "Question: ...\\nA) ...\\nB) ...\\nC) ...\\nD) ...\\nAnswer: ... (the answer is the letter), and "
+        "\"todo\": a list of 5-8 specific, actionable study tasks as strings."
+    )
+
+def summary_prompt(previous_summary, turns):
+    # Rolling summary request for ConversationContext; the prompt is deterministic, so a fold that
+    # was already summarized once can be served from the response cache
+    transcript = "\n".join(f"{'Student' if role == 'user' else 'Assistant'}: {text}" for role, text in turns)
+    prompt = (
+        f"Summarize this study conversation in at most {SUMMARY_MAX_WORDS} words of plain text. "
+        "Keep the subjects, the questions asked, key facts and explanations given, and anything the student "
+        "said they found difficult, so the conversation can continue from the summary alone.\n\n"
+    )
+    if previous_summary:
+        prompt += f"Summary of the conversation before this part:\n{previous_summary}\n\n"
+    prompt += f"Conversation:\n{transcript}"
+    return prompt
+
+def parse_batch_reply(text, subjects):
+    # Returns {subject: {"quiz": str, "todo": [str]}} for the subjects found in a batch_prompt reply
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("no JSON object in batch reply")
+    data = json.loads(text[start:end + 1])
+    by_name = {str(key).strip().lower(): value for key, value in data.items() if isinstance(value, dict)}
+    results = {}
+    for subject in subjects:
+        entry = by_name.get(subject.lower())
+        if entry is None:
+            continue
+        todo = entry.get("todo") or []
+        if isinstance(todo, str):
+            todo = todo.splitlines()
+        results[subject] = {
+            "quiz": str(entry.get("quiz") or ""),
+            "todo": [str(t).strip() for t in todo if str(t).strip()],
+        }
+    return results
+
+def parse_quiz(text):
+    # Parse the quiz text into a list of dicts: [{question, choices, answer}]
+    parser = QuizStreamParser()
+    return parser.feed(text) + parser.finish()
+
+# Subjects and intents are found in a single pass over the message (see matcher.py).
+# Intents are added in precedence order: quiz, explain, summary, help.
+keyword_matcher = KeywordMatcher()
+keyword_matcher.add("subject", COMMON_SUBJECTS)
+keyword_matcher.add("intent", QUIZ_KEYWORDS, label="quiz")
+keyword_matcher.add("intent", EXPLAIN_KEYWORDS, label="explain")
+keyword_matcher.add("intent", SUMMARY_KEYWORDS, label="summary")
+keyword_matcher.add("intent", HELP_KEYWORDS, label="help")
+
+def add_subjects(terms):
+    # Extend the subject vocabulary (e.g. from an imported syllabus); recompiled on next use
+    keyword_matcher.add("subject", terms)
+
+def is_known_subject(subject):
+    # Whether subject is in the subject vocabulary, not a last-word guess. Intent keywords share
+    # the matcher, so being one of its terms isn't enough ("help", "quiz", "tips").
+    return any(kind == "subject" for kind, _, _ in keyword_matcher.terms.get(subject.lower(), ()))
+
+def classify_message(text):
+    # Returns (subject, intent), either of which may be None
+    text_lower = text.lower()
+    subject = None  # (rank, label)
+    intent = None
+    for kind, label, rank in keyword_matcher.scan(text_lower):
+        if kind == "subject" and (subject is None or rank < subject[0]):
+            subject = (rank, label)
+        elif kind == "intent" and (intent is None or rank < intent[0]):
+            intent = (rank, label)
+    intent = intent[1] if intent is not None else None
+    if subject is not None:
+        return subject[1].capitalize(), intent
+    # No known subject: fall back to the last word that isn't a generic one
+    words = re.findall(r'\b\w+\b', text_lower)
+    candidates = [w for w in words if w not in GENERIC_WORDS]
+    if candidates:
+        return candidates[-1].capitalize(), intent
+    return None, intent
+
+# Improved subject extraction
+def extract_subject(text):
+    return classify_message(text)[0]
+
+def detect_intent(text):
+    return classify_message(text)[1]
+
+# --- Sessions ---
+CANNED_REPLIES = {
+    "quiz": "Sure! What topic or subject would you like to be quizzed on?",
+    "explain": "I'd be happy to explain! What specific concept or topic do you need help with?",
+    "summary": "Of course! Please tell me what you want summarized.",
+    "help": "Here are some study tips: Try the Pomodoro technique, use active recall, and space out your revision. Would you like more details or a study plan?",
+}
+
+class QuizState:
+    def __init__(self, subject):
+        self.subject = subject
+        self.questions = []  # Grows while the quiz is still streaming in
+        self.index = 0
+        self.score = 0
+        self.complete = False  # Every question has arrived
+
+    def current(self):
+        return self.questions[self.index] if self.index < len(self.questions) else None
+
+    def finished(self):
+        return self.complete and self.index >= len(self.questions)
+
+class Turn:
+    # One user message: what was detected, and the history slot its AI reply streams into
+    def __init__(self, message, subject, intent, canned_reply, new_subject, history, reply_index):
+        self.message = message
+        self.subject = subject
+        self.intent = intent
+        self.canned_reply = canned_reply
+        self.new_subject = new_subject
+        self.history = history  # Conversation before this message, as sent to the model
+        self.reply_index = reply_index
+
+# Everything one user has going on. Plain state plus synchronous edits; the MindMate methods that
+# need the API fill it in.
+class Session:
+    def __init__(self, session_id, record_answer=None):
+        self.id = session_id
+        self.record_answer = record_answer  # record_answer(question, correct), e.g. into the question bank
+        self.subjects = set()
+        self.todo_lists = {}  # {subject: [ {"task": str, "done": bool} ]}
+        self.quiz = None  # QuizState of the current quiz
+        self.history = []  # List of (sender, message) tuples; a reply still streaming has ""
+        self.context = ConversationContext(
+            PLAIN_SYSTEM_PROMPT,
+            token_budget=CONTEXT_TOKEN_BUDGET, keep_recent=MAX_HISTORY, fold_at=CONTEXT_FOLD_AT,
+            skip=lambda sender, message: message.startswith("[Error")
+        )
+        self.fold_task = None  # Background summary of older turns, while one is running
+        self.last_active = time.monotonic()
+
+    def begin_turn(self, message):
+        # Records the message (and a canned reply for a recognised intent) and reserves the reply's slot
+        history = list(self.history)
+        subject, intent = classify_message(message)
+        new_subject = subject is not None and subject not in self.subjects
+        if subject:
+            self.subjects.add(subject)
+        self.history.append(("You", message))
+        canned_reply = CANNED_REPLIES.get(intent)
+        if canned_reply:
+            self.history.append(("Assistant", canned_reply))
+        self.history.append(("Assistant", ""))
+        return Turn(message, subject, intent, canned_reply, new_subject, history, len(self.history) - 1)
+
+    def start_quiz(self, subject):
+        self.quiz = QuizState(subject)
+        return self.quiz
+
+    def answer(self, choice):
+        quiz = self.quiz
+        question = quiz.current() if quiz is not None else None
+        if question is None:
+            raise ValueError("no quiz question is waiting for an answer")
+        correct = choice.strip().upper() == question["answer"]
+        if correct:
+            quiz.score += 1
+        quiz.index += 1
+        if self.record_answer is not None:
+            self.record_answer(question, correct)
+        return {
+            "correct": correct,
+            "answer": question["answer"],
+            "answer_text": question["choices"].get(question["answer"], ""),
+            "score": quiz.score,
+            "answered": quiz.index,
+            "finished": quiz.finished(),
+        }
+
+    def add_task(self, subject, task):
+        tasks = self.todo_lists.setdefault(subject, [])
+        tasks.append({"task": task, "done": False})
+        return len(tasks) - 1
+
+    def set_task_done(self, subject, idx, done):
+        self.todo_lists[subject][idx]["done"] = done
+
+    def remove_task(self, subject, idx):
+        del self.todo_lists[subject][idx]
+
+# --- Async engine ---
+# One MindMate serves any number of sessions from a single event loop. Upstream requests share a
+# concurrency limit, and identical cached completions in flight (e.g. the same subject's to-do
+# list for several sessions) share one call. Sessions nobody has used for idle_timeout seconds are
+# dropped (None keeps them until end_session, e.g. for the desktop app's single session).
+class MindMate:
+    def __init__(self, transport=transport, cache=SHARED, bank=SHARED, router=model_router,
+                 max_concurrency=ENGINE_MAX_CONCURRENCY, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.transport = transport
+        self.cache = shared_response_cache() if cache is SHARED else cache
+        self.bank = shared_question_bank() if bank is SHARED else bank
+        self.router = router
+        self.max_concurrency = max_concurrency
+        self.semaphore = None  # Created on first use, inside the running loop
+        self.sessions = {}  # {session_id: Session}
+        self.idle_timeout = idle_timeout
+        self.last_sweep = time.monotonic()
+        self.inflight = {}  # {prompt: Future} for uncached completions being fetched
+
+    def session(self, session_id="default"):
+        now = time.monotonic()
+        if self.idle_timeout is not None and now - self.last_sweep >= SESSION_SWEEP_INTERVAL:
+            self.expire_sessions(now)
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session(session_id, self._record_answer)
+        session.last_active = now
+        return session
+
+    def expire_sessions(self, now=None):
+        # Drops the sessions idle for longer than idle_timeout; returns how many went
+        now = time.monotonic() if now is None else now
+        self.last_sweep = now
+        idle = [sid for sid, session in self.sessions.items() if now - session.last_active > self.idle_timeout]
+        for session_id in idle:
+            self.end_session(session_id)
+        if idle:
+            log.info("Expired %d idle session(s), %d left", len(idle), len(self.sessions))
+        return len(idle)
+
+    def end_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is not None and session.fold_task is not None:
+            session.fold_task.cancel()
+
+    async def chat(self, session_id, message, on_text=None):
+        session = self.session(session_id)
+        turn = session.begin_turn(message)
+        reply, error = await self.reply(session, turn, on_text)
+        return {
+            "subject": turn.subject, "intent": turn.intent, "canned_reply": turn.canned_reply,
+            "reply": reply, "error": error,
+        }
+
+    async def reply(self, session, turn, on_text=None):
+        # Streams the AI reply for turn into its history slot; on_text(text) gets each cleaned piece.
+        # Returns (reply, None), or (None, error message), which then replaces the slot's text.
+        call = start_call("chat")
+        cleaner = MarkdownCleaner()
+        parts = []
+        try:
+            messages = session.context.build(turn.history, turn.message)
+            call.set(context_messages=len(messages) - 2)
+            async for delta in self._stream("chat", messages, call):
+                parts.append(delta)
+                self._reply_text(session, turn, cleaner.feed(delta), on_text)
+            self._reply_text(session, turn, cleaner.finish(), on_text)
+            call.finish()
+        except Exception as e:
+            call.finish(e)
+            log.error("OpenRouter API call failed: %s", e)
+            error = f"[Error contacting AI: {describe_error(e)}]"
+            session.history[turn.reply_index] = ("Assistant", error)
+            return None, error
+        finally:
+            # Older turns are summarized after the reply, so a fold never delays one
+            self._fold_later(session)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Chat reply: %s", "".join(parts))
+        return session.history[turn.reply_index][1], None
+
+    def _reply_text(self, session, turn, text, on_text):
+        if not text:
+            return
+        sender, message = session.history[turn.reply_index]
+        session.history[turn.reply_index] = (sender, message + text)
+        if on_text is not None:
+            on_text(text)
+
+    async def generate_quiz(self, session_id, subject, refresh=False, on_question=None, quiz=None):
+        # Fills quiz (by default a new current quiz for the session) and returns its questions.
+        # on_question(quiz, index, question) is called as each question arrives. With a question
+        # bank, the questions due for review come first and the model is only asked for the rest;
+        # refresh skips straight to new questions.
+        session = self.session(session_id)
+        if quiz is None:
+            quiz = session.start_quiz(subject)
+        call = start_call("quiz")
+        if self.bank is not None:
+            if not refresh:
+                for q in self.bank.pick(subject, QUIZ_LENGTH):
+                    self._add_question(quiz, q, on_question)
+                if len(quiz.questions) >= QUIZ_LENGTH:
+                    quiz.complete = True
+                    call.set(cache="bank", questions=len(quiz.questions))
+                    call.finish()
+                    return quiz.questions
+            # The bank replaces the response cache for quizzes: a cached reply would only repeat stored questions
+            prompt = quiz_prompt(subject, self.bank.stems(subject, AVOID_QUESTIONS))
+        else:
+            prompt = quiz_prompt(subject)
+            if not refresh:
+                cached = self._cache_get("quiz", prompt)
+                if cached is not None:
+                    questions = parse_quiz(cached)
+                    if questions:
+                        for q in questions:
+                            self._add_question(quiz, q, on_question)
+                        quiz.complete = True
+                        call.set(cache="hit", questions=len(questions))
+                        call.finish()
+                        return quiz.questions
+                    # Don't keep serving a response we couldn't parse
+                    self._cache_invalidate("quiz", prompt)
+        call.set(cache="miss", from_bank=len(quiz.questions))
+        parser = QuizStreamParser()
+        parts = []
+        try:
+            async for delta in self._stream("quiz", self._plain_messages(prompt), call):
+                parts.append(delta)
+                for q in parser.feed(delta):
+                    self._offer_question(quiz, q, on_question)
+            for q in parser.finish():
+                self._offer_question(quiz, q, on_question)
+        except Exception as e:
+            call.set(questions=len(quiz.questions))
+            call.finish(e)
+            # Keep what already arrived, topped up from the bank; only fail if there is nothing to show
+            self._fill_from_bank(quiz, on_question)
+            if not quiz.questions:
+                raise
+            quiz.complete = True
+            return quiz.questions
+        self._fill_from_bank(quiz, on_question)
+        quiz.complete = True
+        call.set(questions=len(quiz.questions))
+        call.finish()
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Quiz raw text for %s:\n%s", subject, "".join(parts))
+        if quiz.questions and self.bank is None:
+            self._cache_put("quiz", prompt, "".join(parts))
+        return quiz.questions
+
+    def _add_question(self, quiz, question, on_question):
+        quiz.questions.append(question)
+        if on_question is not None:
+            on_question(quiz, len(quiz.questions) - 1, question)
+
+    def _offer_question(self, quiz, question, on_question):
+        # A generated question: without a bank it goes straight into the quiz. With one it is stored,
+        # and only used if it isn't a near-duplicate of a stored question and the quiz isn't full yet.
+        if self.bank is None:
+            self._add_question(quiz, question, on_question)
+            return
+        question_id, new = self.bank.add(quiz.subject, question)
+        if new and len(quiz.questions) < QUIZ_LENGTH:
+            self._add_question(quiz, dict(question, id=question_id), on_question)
+
+    def _fill_from_bank(self, quiz, on_question):
+        # Too few new questions (the model repeated itself, or the request failed): fill up with
+        # stored questions that aren't due yet, the soonest due first
+        missing = QUIZ_LENGTH - len(quiz.questions)
+        if self.bank is None or missing <= 0:
+            return
+        exclude = {q.get("id") for q in quiz.questions}
+        for q in self.bank.pick(quiz.subject, missing, exclude, due_only=False):
+            self._add_question(quiz, q, on_question)
+
+    def _record_answer(self, question, correct):
+        if self.bank is not None and question.get("id") is not None:
+            self.bank.record(question["id"], correct)
+
+    async def answer_question(self, session_id, choice):
+        return self.session(session_id).answer(choice)
+
+    async def generate_todo(self, session_id, subject, refresh=False):
+        # Returns the session's task list for subject, generating it unless it exists (or refresh)
+        session = self.session(session_id)
+        if session.todo_lists.get(subject) and not refresh:
+            return session.todo_lists[subject]
+        call = start_call("todo")
+        try:
+            todo_text = await self._complete("todo", todo_prompt(subject), call, refresh=refresh)
+        except Exception as e:
+            call.finish(e)
+            raise
+        call.finish()
+        log.debug("To-Do AI response for %s:\n%s", subject, todo_text)
+        tasks = [{"task": line.strip(), "done": False} for line in todo_text.splitlines() if line.strip()]
+        session.todo_lists[subject] = tasks
+        return tasks
+
+    async def prefetch(self, subjects):
+        # One structured request covers every subject whose quiz or to-do list isn't stocked yet. The
+        # reply is split per subject: questions go into the bank (or the cache without one), to-do
+        # lists into the cache under the key the single fetch uses.
+        missing = [s for s in subjects if not self._quiz_stocked(s) or self._cache_get("todo", todo_prompt(s)) is None]
+        if not missing:
+            return
+        call = start_call("prefetch", subjects=len(missing))
+        try:
+            text = await self._complete("prefetch", batch_prompt(missing), call, refresh=True, store=False)
+            results = parse_batch_reply(text, missing)
+        except Exception as e:
+            call.finish(e)
+            raise
+        call.finish()
+        for subject, result in results.items():
+            questions = parse_quiz(result["quiz"])
+            if self.bank is not None:
+                for q in questions:
+                    self.bank.add(subject, q)
+            elif questions and self._cache_get("quiz", quiz_prompt(subject)) is None:
+                self._cache_put("quiz", quiz_prompt(subject), result["quiz"])
+            if result["todo"] and self._cache_get("todo", todo_prompt(subject)) is None:
+                self._cache_put("todo", todo_prompt(subject), "\n".join(result["todo"]))
+
+    def _fold_later(self, session):
+        # Starts summarizing the session's older turns in the background once a fold is due
+        if session.fold_task is not None and not session.fold_task.done():
+            return
+        pending = session.context.pending_fold(session.history)
+        if pending is not None:
+            session.fold_task = asyncio.ensure_future(self._fold(session, *pending))
+
+    async def _fold(self, session, previous_summary, turns, end):
+        call = start_call("summary", turns=len(turns))
+        try:
+            content = await self._complete("summary", summary_prompt(previous_summary, turns), call)
+            call.finish()
+        except Exception as e:
+            call.finish(e)
+            log.error("Summarizing chat history failed: %s", e)
+            return
+        session.context.apply_fold(previous_summary, clean_ai_response(content), end)
+
+    def _quiz_stocked(self, subject):
+        # Whether a quiz for subject can be served without a request
+        if self.bank is not None:
+            return self.bank.due_count(subject) >= QUIZ_LENGTH
+        return self._cache_get("quiz", quiz_prompt(subject)) is not None
+
+    # --- Upstream ---
+    def _plain_messages(self, prompt):
+        return [
+            {"role": "system", "content": PLAIN_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, call):
+        # Holds one of the max_concurrency upstream slots; the wait for it counts as queue time
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
+        async with self.semaphore:
+            waited = _queue_wait.get() + time.perf_counter() - started
+            call.set(queue_wait_ms=round(waited * 1000, 1))
+            yield
+
+    async def _race(self, task, call, attempt, discard=None):
+        # Runs attempt(model) for the task's primary model, hedged with its fallback (see routing.py),
+        # and returns the first successful result. Attempts still running are cancelled; discard(result)
+        # releases a successful result that lost.
+        route = self.router.route(task)
+        started = time.perf_counter()
+        running = {}  # {future: model}
+        fallback = route.fallback
+        error = None
+        running[asyncio.ensure_future(attempt(route.primary))] = route.primary
+        call.set(model=route.primary)
+        try:
+            if fallback is not None:
+                done, _ = await asyncio.wait(running, timeout=self.router.deadline(task))
+                if not done:
+                    call.set(hedged=True)
+                    running[asyncio.ensure_future(attempt(fallback))] = fallback
+                    fallback = None
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    model = running.pop(future)
+                    if future.exception() is None:
+                        if model == route.primary:
+                            self.router.observe(task, time.perf_counter() - started)
+                        call.set(model=model)
+                        return future.result()
+                    error = future.exception()
+                    call.set(model=model)
+                    log.warning("%s request to %s failed: %s", task, model, error)
+                if fallback is not None and not running:
+                    call.set(fallback=True)
+                    running[asyncio.ensure_future(attempt(fallback))] = fallback
+                    fallback = None
+            raise error
+        finally:
+            for future, model in running.items():
+                future.cancel()
+                if model == route.primary:
+                    # Censored sample: the primary took at least this long
+                    self.router.observe(task, time.perf_counter() - started)
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+                for future in running:
+                    if discard is not None and not future.cancelled() and future.exception() is None:
+                        await discard(future.result())
+
+    async def _stream(self, task, messages, call):
+        # Yields the text deltas of a streamed completion; the race is for the first token
+        async def attempt(model):
+            deltas = self._deltas(model, messages, call)
+            try:
+                return deltas, await deltas.__anext__()
+            except StopAsyncIteration:
+                return deltas, None
+            except BaseException:
+                await deltas.aclose()
+                raise
+
+        deltas, first = await self._race(task, call, attempt, discard=lambda result: result[0].aclose())
+        try:
+            if first is None:
+                return
+            call.first_token()
+            yield first
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
+
+    async def _deltas(self, model, messages, call):
+        # Text deltas of one streamed completion from model, holding an upstream slot throughout
+        async with self._slot(call):
+            stream = self.transport.astream(
+                extra_headers=EXTRA_HEADERS, model=model, messages=messages,
+                stream_options={"include_usage": True}
+            )
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        call.usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                await stream.aclose()
+
+    async def _create(self, model, prompt, call):
+        async with self._slot(call):
+            return await self.transport.acreate(
+                extra_headers=EXTRA_HEADERS, model=model, messages=self._plain_messages(prompt))
+
+    async def _complete(self, task, prompt, call, refresh=False, store=True):
+        # Non-streamed completion, served from the cache when possible
+        if not refresh:
+            cached = self._cache_get(task, prompt)
+            if cached is not None:
+                call.set(cache="hit")
+                return cached
+        call.set(cache="miss")
+        future = self.inflight.get(prompt)
+        if future is not None:
+            call.set(shared=True)
+            return await asyncio.shield(future)
+        future = self.inflight[prompt] = asyncio.get_running_loop().create_future()
+        try:
+            completion = await self._race(task, call, lambda model: self._create(model, prompt, call))
+            call.first_token()
+            call.usage(completion.usage)
+            content = completion.choices[0].message.content
+            if store:
+                self._cache_put(task, prompt, content)
+            future.set_result(content)
+            return content
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Marks it retrieved when nobody else was waiting
+            raise
+        finally:
+            del self.inflight[prompt]
+
+    # Cache entries are keyed on the task's primary model, whichever model actually answered
+    def _cache_get(self, task, prompt):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.router.route(task).primary, PLAIN_SYSTEM_PROMPT, prompt)
+
+    def _cache_put(self, task, prompt, content):
+        if self.cache is not None and content:
+            self.cache.put(self.router.route(task).primary, PLAIN_SYSTEM_PROMPT, prompt, content)
+
+    def _cache_invalidate(self, task, prompt):
+        if self.cache is not None:
+            self.cache.invalidate(self.router.route(task).primary, PLAIN_SYSTEM_PROMPT, prompt)
+
+def start_engine_loop():
+    # Runs an event loop on a daemon thread, for clients (like the Tk app) that aren't async themselves
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="engine-loop", daemon=True).start()
+    return loop
@@ -1,95 +1,92 @@
+import time
+from metrics import StartupProfile
+startup = StartupProfile()  # Phases reported by --profile-startup (from here on; interpreter start-up isn't included)
 import customtkinter as ctk
 import tkinter as tk
-from openai import OpenAI
+startup.mark("import customtkinter")
+import argparse
+import asyncio
+import queue
 import threading
-import re
-import time
+from scheduler import RequestScheduler, PRIORITY_CHAT, PRIORITY_USER, PRIORITY_BACKGROUND, current_queue_wait
+from metrics import LagMonitor, log
+from engine import (
+    MindMate, start_engine_loop, with_queue_wait, describe_error, metrics, is_known_subject,
+    API_MAX_WORKERS,
+)
+startup.mark("import engine")
 
 # App Config
 ctk.set_appearance_mode("Dark")  # Modes: "System" (default), "Dark", "Light"
 ctk.set_default_color_theme("blue")
 
-# --- DeepSeek/OpenRouter API Setup ---
-API_KEY = "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"
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=API_KEY,
-)
-
-# List of common study subjects
-COMMON_SUBJECTS = [
-    "c++", "python", "java", "javascript", "html", "css", "physics", "math", "mathematics", "biology", "chemistry", "english", "history", "geography", "science", "algebra", "geometry", "calculus", "statistics", "literature", "economics", "philosophy", "art", "music", "computer science", "programming", "sql", "networking", "machine learning", "ai", "artificial intelligence", "data science", "french", "spanish", "german", "arabic", "italian", "chinese", "japanese"
-]
-
-GENERIC_WORDS = {"some", "about", "me", "a", "an", "the", "on", "in", "to", "for", "with", "of", "at", "by", "from", "and", "or", "is", "are", "was", "were", "it", "that", "this", "as", "be", "do", "does", "did"}
-
-# Simple intent keywords
-QUIZ_KEYWORDS = ["quiz", "test me", "questions", "practice questions"]
-EXPLAIN_KEYWORDS = ["explain", "explanation", "clarify", "understand"]
-SUMMARY_KEYWORDS = ["summarize", "summary", "short version"]
-HELP_KEYWORDS = ["help", "how to study", "tips", "advice", "improve", "technique"]
-
-MAX_HISTORY = 8  # Number of messages to keep in context (not used in single-turn mode)
-
-PLAIN_SYSTEM_PROMPT = (
-    "You are a helpful AI study assistant. Only answer study-related questions. "
-    "Always reply in plain text. Never use any markdown, stars, hashtags, bold, or special formatting. "
-    "If you need to show a list, use numbers or dashes. If you need to show code, write it as plain text. "
-    "Be clear, direct, and easy to understand."
-)
-
-# Function to clean up markdown, stars, hashtags, and bold from AI response
-def clean_ai_response(text):
-    # Remove markdown bold/italic/code, stars, hashtags
-    text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # **bold**
-    text = re.sub(r'\*([^*]+)\*', r'\1', text)        # *italic*
-    text = re.sub(r'`([^`]+)`', r'\1', text)           # `code`
-    text = re.sub(r'#+\s*', '', text)                  # # headers
-    text = re.sub(r'\*', '', text)                     # stray stars
-    text = re.sub(r'\s*\n\s*', '\n', text)          # clean up newlines
-    return text.strip()
-
-# Improved subject extraction
-
-def extract_subject(text):
-    text_lower = text.lower()
-    # 1. Look for known subjects in the message
-    for subject in COMMON_SUBJECTS:
-        if subject in text_lower:
-            return subject.capitalize()
-    # 2. Extract nouns/phrases, ignore generic words
-    words = re.findall(r'\b\w+\b', text_lower)
-    candidates = [w for w in words if w not in GENERIC_WORDS]
-    # 3. Return the last candidate if no known subject found
-    if candidates:
-        return candidates[-1].capitalize()
-    return None
-
-def detect_intent(text):
-    text = text.lower()
-    if any(word in text for word in QUIZ_KEYWORDS):
-        return "quiz"
-    if any(word in text for word in EXPLAIN_KEYWORDS):
-        return "explain"
-    if any(word in text for word in SUMMARY_KEYWORDS):
-        return "summary"
-    if any(word in text for word in HELP_KEYWORDS):
-        return "help"
-    return None
-
-# Helper for fade-in animation
-def fade_in(widget, steps=10, delay=15):
-    try:
-        widget.update()
-        widget.attributes('-alpha', 0)
-        for i in range(steps + 1):
-            alpha = i / steps
-            widget.attributes('-alpha', alpha)
-            widget.update()
-            widget.after(delay)
-        widget.attributes('-alpha', 1)
-    except Exception:
-        pass  # Not all widgets support alpha
+UI_PUMP_MS = 16  # How often the main loop drains events posted by worker threads
+ANIMATION_FRAME_MS = 16  # Frame clock for the animation engine
+FADE_MS = 120  # Duration of fade-in transitions
+TODO_ROW_HEIGHT = 36  # Fixed row height lets the to-do list compute the visible rows without measuring
+UI_MAX_BATCH = 500  # Upper bound on events handled per pump tick, so a flood can't stall input
+PREFETCH_DELAY_MS = 1500  # Newly detected subjects are collected this long before prefetching, so they can share a request
+PREFETCH_BATCH_SIZE = 3  # Max subjects generated by one prefetch request
+LAG_CHECK_MS = 100  # How often the main loop's responsiveness is sampled
+LAG_REPORT_MS = 50  # Main-loop stalls longer than this are logged
+STATS_REFRESH_MS = 1000  # F12 opens the stats panel
+SESSION_ID = "local"  # The desktop app is a single engine session
+
+# Non-blocking animation engine: every running animation advances from one after()-driven
+# frame clock, so nothing spins the event loop with update(). Starting a new animation on the
+# same widget/property replaces the running one and continues from its current value.
+class Animator:
+    def __init__(self, root, frame_ms=ANIMATION_FRAME_MS):
+        self.root = root
+        self.frame_ms = frame_ms
+        self.animations = {}  # {(widget path, prop): animation state}
+        self.tick_id = None
+        # Probed once: only toplevel windows have -alpha, and some platforms reject it entirely
+        try:
+            root.attributes('-alpha', 1.0)
+            self.alpha_supported = True
+        except tk.TclError:
+            self.alpha_supported = False
+
+    def supports_alpha(self, widget):
+        return self.alpha_supported and isinstance(widget, (tk.Tk, tk.Toplevel))
+
+    def animate(self, widget, prop, start, end, duration_ms, apply, on_done=None):
+        key = (str(widget), prop)
+        running = self.animations.get(key)
+        if running is not None:
+            start = running["value"]
+        anim = {"start": start, "end": end, "value": start, "t0": time.monotonic(),
+                "duration": max(duration_ms, 1) / 1000, "apply": apply, "on_done": on_done}
+        self.animations[key] = anim
+        apply(start)
+        if self.tick_id is None:
+            self.tick_id = self.root.after(self.frame_ms, self.tick)
+
+    def cancel(self, widget, prop=None):
+        for key in [k for k in self.animations if k[0] == str(widget) and (prop is None or k[1] == prop)]:
+            del self.animations[key]
+
+    def fade_in(self, widget, duration_ms=FADE_MS):
+        if not self.supports_alpha(widget):
+            return
+        self.animate(widget, "alpha", 0.0, 1.0, duration_ms, lambda v: widget.attributes('-alpha', v))
+
+    def tick(self):
+        now = time.monotonic()
+        for key, anim in list(self.animations.items()):
+            t = min((now - anim["t0"]) / anim["duration"], 1.0)
+            anim["value"] = anim["start"] + (anim["end"] - anim["start"]) * t
+            try:
+                anim["apply"](anim["value"])
+            except tk.TclError:
+                t = 1.0  # Widget went away mid-animation
+            if t >= 1.0:
+                if self.animations.get(key) is anim:
+                    del self.animations[key]
+                if anim["on_done"] is not None:
+                    anim["on_done"]()
+        self.tick_id = self.root.after(self.frame_ms, self.tick) if self.animations else None
 
 # Helper for button hover effect
 class HoverButton(ctk.CTkButton):
@@ -104,32 +101,197 @@ class HoverButton(ctk.CTkButton):
     def on_leave(self, event):
         self.configure(fg_color=self.default_fg)
 
+# Main-thread UI dispatch: worker threads never touch Tk directly, they post events here and an
+# after()-driven pump drains them in batches. Consecutive text events for the same target are
+# merged, so a burst of messages or streamed chunks costs a single widget update.
+class UIDispatcher:
+    def __init__(self, root, interval_ms=UI_PUMP_MS, max_batch=UI_MAX_BATCH):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self.events = queue.Queue()
+        self.root.after(self.interval_ms, self.pump)
+
+    def post(self, fn, *args):
+        # Safe to call from any thread
+        self.events.put((fn, args, False))
+
+    def post_text(self, fn, target, text):
+        # fn(target, text); adjacent events with the same fn and target are joined into one call
+        self.events.put((fn, (target, text), True))
+
+    def flush(self, limit=None):
+        batch = []
+        while limit is None or len(batch) < limit:
+            try:
+                batch.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        merged = []  # [fn, target or args, text parts or None]
+        for fn, args, is_text in batch:
+            last = merged[-1] if merged else None
+            if is_text and last and last[2] is not None and last[0] == fn and last[1] == args[0]:
+                last[2].append(args[1])
+            elif is_text:
+                merged.append([fn, args[0], [args[1]]])
+            else:
+                merged.append([fn, args, None])
+        for fn, args, parts in merged:
+            try:
+                if parts is None:
+                    fn(*args)
+                else:
+                    fn(args, "".join(parts))
+            except Exception:
+                log.exception("UI event failed")
+
+    def pump(self):
+        self.flush(self.max_batch)
+        self.root.after(self.interval_ms, self.pump)
+
+# Virtualized to-do list: only rows inside the viewport exist as widgets. Row widgets are pooled
+# and recycled while scrolling (index i always lands in slot i % pool size, so scrolling one row
+# rebinds one widget), and edits rebind only the rows they affect.
+class VirtualTaskList(ctk.CTkFrame):
+    def __init__(self, master, on_toggle, on_remove, row_height=TODO_ROW_HEIGHT, height=320, **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_toggle = on_toggle  # on_toggle(index, done)
+        self.on_remove = on_remove  # on_remove(index)
+        self.row_height = row_height
+        self.items = []
+        self.rows = []  # Pooled rows: {"frame", "item", "var", "check", "index"}
+        self.canvas = tk.Canvas(self, borderwidth=0, highlightthickness=0, height=height)
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", self.on_resize)
+        # Bound once; the handler ignores wheel events that happen outside this list
+        self.canvas.bind_all("<MouseWheel>", self.on_mousewheel, add="+")
+        self.canvas.bind_all("<Button-4>", self.on_mousewheel, add="+")
+        self.canvas.bind_all("<Button-5>", self.on_mousewheel, add="+")
+
+    def set_items(self, items):
+        # Show a different list (e.g. another subject); every visible row gets rebound
+        self.items = items
+        for row in self.rows:
+            row["index"] = None
+        self.canvas.yview_moveto(0)
+        self.items_changed()
+
+    def items_changed(self, start=0):
+        # Items from `start` onwards were inserted, removed or edited
+        for row in self.rows:
+            if row["index"] is not None and row["index"] >= start:
+                row["index"] = None
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), len(self.items) * self.row_height))
+        self.refresh_rows()
+
+    def on_resize(self, event):
+        needed = event.height // self.row_height + 2
+        while len(self.rows) < needed:
+            self.rows.append(self.make_row())
+        for row in self.rows:
+            self.canvas.itemconfigure(row["item"], width=event.width)
+            row["index"] = None  # Pool size changed, so slots map to different indices
+        self.items_changed()
+
+    def make_row(self):
+        frame = ctk.CTkFrame(self.canvas, height=self.row_height, fg_color="transparent")
+        frame.pack_propagate(False)
+        row = {"frame": frame, "var": tk.BooleanVar(), "index": None}
+        row["check"] = ctk.CTkCheckBox(frame, text="", variable=row["var"], command=lambda r=row: self.on_toggle(r["index"], r["var"].get()))
+        row["check"].pack(side="left", padx=20)
+        remove_btn = ctk.CTkButton(frame, text="Remove", width=60, command=lambda r=row: self.on_remove(r["index"]))
+        remove_btn.pack(side="right", padx=10)
+        row["item"] = self.canvas.create_window(0, 0, window=frame, anchor="nw", height=self.row_height, state="hidden")
+        return row
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.refresh_rows()
+
+    def refresh_rows(self):
+        if not self.rows:
+            return
+        pool = len(self.rows)
+        first = max(int(self.canvas.canvasy(0)) // self.row_height, 0)
+        for index in range(first, first + pool):
+            row = self.rows[index % pool]
+            if index >= len(self.items):
+                row["index"] = None
+                self.canvas.itemconfigure(row["item"], state="hidden")
+            elif row["index"] != index:
+                item = self.items[index]
+                row["index"] = index
+                row["check"].configure(text=item["task"])
+                row["var"].set(item["done"])
+                self.canvas.coords(row["item"], 0, index * self.row_height)
+                self.canvas.itemconfigure(row["item"], state="normal")
+
+    def on_mousewheel(self, event):
+        if not str(event.widget).startswith(str(self.canvas)):
+            return
+        if event.num == 4:
+            delta = -1
+        elif event.num == 5:
+            delta = 1
+        else:
+            delta = int(-1*(event.delta/120))
+        self.canvas.yview_scroll(delta, "units")
+
 class YourAssistantApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, profile_startup=False):
         super().__init__()
         self.title("Your Assistant")
         self.geometry("800x600")
         self.resizable(False, False)
         self.configure(fg_color="#181F2A")
-
-        # Track all unique subjects for quizzes and to-do lists
-        self.subjects_set = set()
-        self.quiz_data = None
-        self.quiz_index = 0
-        self.quiz_score = 0
+        self.profile_startup = profile_startup
+        startup.mark("create window")
+
+        # Subjects, quiz progress, to-do lists and chat history all live in an engine session; the window
+        # renders them and runs the engine's coroutines on a background event loop
+        self.engine = MindMate(idle_timeout=None)
+        self.engine_loop = start_engine_loop()
+        self.session = self.engine.session(SESSION_ID)
         self.current_quiz_subject = None
-        self.todo_lists = {}  # {subject: [ {"task": str, "done": bool} ]}
+        self.quiz_waiting = False  # The user is ahead of the stream and the next question is still generating
         self.current_todo_subject = None
-        self.todo_task_vars = []
 
-        # --- Preserve chat history ---
-        self.chat_history_content = []  # List of (sender, message) tuples
+        self.animator = Animator(self)
+        self.lag_monitor = LagMonitor(self, metrics, LAG_CHECK_MS, LAG_REPORT_MS)
+        self.lag_monitor.start()
+        # Hidden stats panel with p50/p95 of everything metrics records
+        self.stats_window = None
+        self.stats_after_id = None
+        self.bind_all("<F12>", lambda event: self.toggle_stats_panel())
+        # Worker threads reach the widgets only through this queue
+        self.ui = UIDispatcher(self)
+        # All API traffic goes through one bounded, deduplicating scheduler; callbacks run on the Tk main loop
+        self.scheduler = RequestScheduler(max_workers=API_MAX_WORKERS, dispatch=self.ui.post)
+        self.quiz_ticket = None
+        self.todo_ticket = None
+        # Background generation for newly detected subjects
+        self.prefetch_queue = []  # Subjects waiting for the next batch
+        self.prefetch_after_id = None
+        self.prefetch_inflight = {}  # {subject: (scheduler key, batch)} while its batch is queued or running
+
+        self.active_replies = {}  # {reply_id: Turn} for replies still streaming
+        self.next_reply_id = 0
+        startup.mark("engine and scheduler")
 
         # Navigation
         self.nav_frame = ctk.CTkFrame(self, width=200)
         self.nav_frame.pack(side="left", fill="y")
         self.content_frame = ctk.CTkFrame(self)
         self.content_frame.pack(side="right", fill="both", expand=True)
+        self.content_frame.pack_propagate(False)
+
+        # Section views, built on first visit and kept alive after that
+        self.views = {}
+        self.quiz_subject_buttons = {}  # {subject: button}
+        self.todo_subject_buttons = {}
 
         self.sections = {
             "Chatbot": self.show_chatbot,
@@ -141,226 +303,328 @@ class YourAssistantApp(ctk.CTk):
             btn.pack(pady=20, padx=10, fill="x")
 
         self.current_section = None
-        self.show_chatbot()
+        # The chat section is built once the window has been mapped, so the window shows up first
+        self.mapped = False
+        self.bind("<Map>", self.on_first_map, add="+")
+        self.animator.fade_in(self)
+        startup.mark("navigation")
+
+    def on_first_map(self, event):
+        if event.widget is not self or self.mapped:
+            return
+        self.mapped = True
+        startup.mark("map window")
+        # Idle callbacks run in order, so the redraws already queued come before the chat build
+        self.after_idle(self.finish_startup)
 
-    def clear_content(self):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+    def finish_startup(self):
+        startup.mark("first paint")
+        self.show_chatbot()
+        self.update_idletasks()
+        startup.mark("build chat section")
+        # Import the SDK and build its client now, off the main thread, rather than on the first request
+        threading.Thread(target=self.warm_up_api, name="api-warmup", daemon=True).start()
 
-    def fade_in_section(self):
+    def warm_up_api(self):
+        started = time.perf_counter()
         try:
-            self.content_frame.update()
-            self.content_frame.attributes('-alpha', 0)
-            for i in range(11):
-                alpha = i / 10
-                self.content_frame.attributes('-alpha', alpha)
-                self.content_frame.update()
-                self.content_frame.after(10)
-            self.content_frame.attributes('-alpha', 1)
+            self.engine.transport.warm_up()
         except Exception:
-            pass
+            log.exception("Warming up the API client failed")
+        startup.add_background("import openai + build async client", time.perf_counter() - started)
+        if self.profile_startup:
+            self.ui.post(self.report_startup)
+
+    def report_startup(self):
+        print(startup.report())
+        self.destroy()
+
+    def run_engine(self, coro):
+        # Runs on a scheduler worker: hands the coroutine to the engine loop and waits for it, so the
+        # scheduler's priorities, dedup and cancellation still decide what the engine works on
+        future = asyncio.run_coroutine_threadsafe(with_queue_wait(coro, current_queue_wait()), self.engine_loop)
+        return future.result()
+
+    def show_view(self, name, build):
+        # Sections are built once and kept alive; switching only swaps which frame is packed
+        view = self.views.get(name)
+        if self.current_section == name:
+            return view
+        if self.current_section is not None:
+            self.views[self.current_section].pack_forget()
+        if view is None:
+            view = ctk.CTkFrame(self.content_frame, fg_color="transparent")
+            build(view)
+            self.views[name] = view
+        view.pack(fill="both", expand=True)
+        self.current_section = name
+        return view
+
+    def sync_subject_buttons(self, parent, buttons, text, command, before, info):
+        # Add buttons only for subjects that appeared since the last visit, keeping them sorted
+        new_subjects = self.session.subjects - buttons.keys()
+        if not new_subjects:
+            return
+        info.pack_forget()
+        for subject in sorted(new_subjects):
+            btn = ctk.CTkButton(parent, text=text.format(subject), command=lambda s=subject: command(s))
+            later = [s for s in buttons if s > subject]
+            btn.pack(pady=8, before=buttons[min(later)] if later else before)
+            buttons[subject] = btn
 
     # --- Chatbot Section ---
     def show_chatbot(self):
-        self.clear_content()
-        self.fade_in_section()
-        label = ctk.CTkLabel(self.content_frame, text="Study-Only Chatbot", font=("Arial", 24, "bold"), text_color="#60A5FA")
+        with metrics.timed("ui_show", section="chat"):
+            self.show_view("Chatbot", self.build_chatbot)
+
+    def build_chatbot(self, view):
+        label = ctk.CTkLabel(view, text="Study-Only Chatbot", font=("Arial", 24, "bold"), text_color="#60A5FA")
         label.pack(pady=10)
 
-        # Chat history display
-        self.chat_history = ctk.CTkTextbox(self.content_frame, width=540, height=350, state="disabled")
+        # Chat history display; it lives as long as the app, so new lines are simply appended
+        self.chat_history = ctk.CTkTextbox(view, width=540, height=350, state="disabled")
         self.chat_history.pack(pady=10)
-
-        # Restore chat history
-        self.chat_history.configure(state="normal")
-        self.chat_history.delete("1.0", tk.END)
-        if not self.chat_history_content:
-            self.append_chat("Assistant", "Hi! I'm your study assistant. Ask me anything about your studies, and I'll help you with explanations, summaries, quizzes, or study tips!")
-        else:
-            for sender, message in self.chat_history_content:
-                self.chat_history.insert(tk.END, f"{sender}: {message}\n")
-        self.chat_history.configure(state="disabled")
-        self.chat_history.see(tk.END)
+        self.append_chat("Assistant", "Hi! I'm your study assistant. Ask me anything about your studies, and I'll help you with explanations, summaries, quizzes, or study tips!")
 
         # User input
-        self.user_input = ctk.CTkEntry(self.content_frame, width=400, font=("Arial", 14))
+        self.user_input = ctk.CTkEntry(view, width=400, font=("Arial", 14))
         self.user_input.pack(side="left", padx=(40, 10), pady=10)
         self.user_input.bind("<Return>", lambda event: self.send_message())
 
         # Send button
-        send_btn = ctk.CTkButton(self.content_frame, text="Send", command=self.send_message)
+        send_btn = ctk.CTkButton(view, text="Send", command=self.send_message)
         send_btn.pack(side="left", pady=10)
 
-        # For threading
-        self.content_frame.pack_propagate(False)
-
     def send_message(self):
         user_msg = self.user_input.get().strip()
         if not user_msg:
             return
         self.user_input.delete(0, tk.END)
-        self.append_chat("You", user_msg)
-        # Improved subject extraction
-        subject = extract_subject(user_msg)
-        if subject:
-            self.subjects_set.add(subject)
-        # Detect intent and proactively help
-        intent = detect_intent(user_msg)
-        if intent == "quiz":
-            self.append_chat("Assistant", "Sure! What topic or subject would you like to be quizzed on?")
-        elif intent == "explain":
-            self.append_chat("Assistant", "I'd be happy to explain! What specific concept or topic do you need help with?")
-        elif intent == "summary":
-            self.append_chat("Assistant", "Of course! Please tell me what you want summarized.")
-        elif intent == "help":
-            self.append_chat("Assistant", "Here are some study tips: Try the Pomodoro technique, use active recall, and space out your revision. Would you like more details or a study plan?")
-        # Only send the latest user message (single-turn mode)
-        threading.Thread(target=self.get_ai_response, args=(user_msg,), daemon=True).start()
+        # The session detects subject and intent in one scan, records the message (plus a canned
+        # reply to proactively help with a recognised intent) and reserves the AI reply's slot
+        turn = self.session.begin_turn(user_msg)
+        self.show_chat_line("You", user_msg)
+        if turn.new_subject:
+            self.queue_prefetch(turn.subject)
+        if turn.canned_reply:
+            self.show_chat_line("Assistant", turn.canned_reply)
+        reply_id = self.next_reply_id
+        self.next_reply_id += 1
+        self.begin_stream_reply(reply_id, turn)
+        self.scheduler.submit(self.get_ai_response, (turn, reply_id), priority=PRIORITY_CHAT)
 
     def append_chat(self, sender, message):
-        # Save to persistent chat history
-        self.chat_history_content.append((sender, message))
+        # Save to persistent chat history; the widget is updated on the next UI pump
+        self.session.history.append((sender, message))
+        self.show_chat_line(sender, message)
+
+    def show_chat_line(self, sender, message):
+        self.ui.post_text(self.write_chat, tk.END, f"{sender}: {message}\n")
+
+    def write_chat(self, index, text):
         self.chat_history.configure(state="normal")
-        self.chat_history.insert(tk.END, f"{sender}: {message}\n")
+        self.chat_history.insert(index, text)
         self.chat_history.configure(state="disabled")
         self.chat_history.see(tk.END)
 
-    def get_ai_response(self, user_msg):
-        try:
-            print("[DEBUG] Sending to OpenRouter API (single-turn):", user_msg)
-            completion = client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "https://mindmate.local",
-                    "X-Title": "MindMate Study Assistant",
-                },
-                model="deepseek/deepseek-r1:free",
-                messages=[
-                    {"role": "system", "content": PLAIN_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_msg}
-                ]
+    def get_ai_response(self, turn, reply_id):
+        # Stream the reply so the first tokens show up while the model is still generating.
+        # The engine cleans chunks as they arrive; they are posted to the UI queue, which merges
+        # everything that arrived since its last pump.
+        reply, error_msg = self.run_engine(self.engine.reply(
+            self.session, turn,
+            on_text=lambda text: self.ui.post_text(self.append_stream_text, reply_id, text)
+        ))
+        # On error the message replaces whatever was streamed so far
+        self.ui.post(self.finish_stream_reply, reply_id, error_msg)
+
+    def begin_stream_reply(self, reply_id, turn):
+        # The session already holds the reply's slot; this adds its line to the widget
+        self.active_replies[reply_id] = turn
+        self.ui.post(self.insert_reply_line, reply_id)
+
+    def insert_reply_line(self, reply_id):
+        # Marks bracket the reply text so chunks land in place even if other lines follow
+        self.chat_history.configure(state="normal")
+        self.chat_history.insert(tk.END, "Assistant: ")
+        self.chat_history.mark_set(f"reply{reply_id}_start", "end-1c")
+        self.chat_history.mark_gravity(f"reply{reply_id}_start", "left")
+        self.chat_history.insert(tk.END, "\n")
+        self.chat_history.mark_set(f"reply{reply_id}_end", "end-2c")
+        self.chat_history.configure(state="disabled")
+        self.chat_history.see(tk.END)
+
+    def append_stream_text(self, reply_id, text):
+        if reply_id not in self.active_replies:
+            return
+        self.write_chat(f"reply{reply_id}_end", text)
+
+    def finish_stream_reply(self, reply_id, error_msg=None):
+        if self.active_replies.pop(reply_id, None) is None:
+            return
+        self.chat_history.configure(state="normal")
+        if error_msg is not None:
+            self.chat_history.delete(f"reply{reply_id}_start", f"reply{reply_id}_end")
+            self.chat_history.insert(f"reply{reply_id}_start", error_msg)
+        self.chat_history.mark_unset(f"reply{reply_id}_start")
+        self.chat_history.mark_unset(f"reply{reply_id}_end")
+        self.chat_history.configure(state="disabled")
+        self.chat_history.see(tk.END)
+
+    # --- Background prefetch ---
+    def queue_prefetch(self, subject):
+        # Only subjects from the known vocabulary are prefetched, not the last-word fallback guesses.
+        # Results land in the response cache and question bank, so there's nothing to gain without them.
+        if (self.engine.cache is None and self.engine.bank is None) or not is_known_subject(subject):
+            return
+        self.prefetch_queue.append(subject)
+        if self.prefetch_after_id is None:
+            self.prefetch_after_id = self.after(PREFETCH_DELAY_MS, self.flush_prefetch)
+
+    def flush_prefetch(self):
+        self.prefetch_after_id = None
+        queued, self.prefetch_queue = self.prefetch_queue, []
+        for i in range(0, len(queued), PREFETCH_BATCH_SIZE):
+            batch = tuple(queued[i:i + PREFETCH_BATCH_SIZE])
+            key = ("prefetch", batch)
+            for subject in batch:
+                self.prefetch_inflight[subject] = (key, batch)
+            self.scheduler.submit(
+                self.prefetch_subjects, (batch,),
+                key=key, priority=PRIORITY_BACKGROUND,
+                on_done=lambda result, b=batch: self.on_prefetch_done(b),
+                on_error=lambda e, b=batch: self.on_prefetch_done(b)
             )
-            print("[DEBUG] OpenRouter API response:", completion)
-            ai_msg = completion.choices[0].message.content
-            ai_msg = clean_ai_response(ai_msg)
-        except Exception as e:
-            print("[ERROR] OpenRouter API call failed:", e)
-            ai_msg = f"[Error contacting AI: {e}]"
-        self.append_chat("Assistant", ai_msg)
+
+    def prefetch_subjects(self, subjects):
+        # Runs on a scheduler worker; the engine fills the response cache for the quiz and to-do fetches
+        self.run_engine(self.engine.prefetch(subjects))
+
+    def on_prefetch_done(self, batch):
+        for subject in batch:
+            if self.prefetch_inflight.get(subject, (None, None))[1] == batch:
+                del self.prefetch_inflight[subject]
+
+    def after_prefetch(self, subject, then):
+        # If subject's batch is still pending, promote it to user priority and run then() once it lands
+        # (whether or not it succeeded, so a failed batch falls back to a normal fetch). Returns the ticket.
+        pending = self.prefetch_inflight.get(subject)
+        if pending is None:
+            return None
+        key, batch = pending
+        return self.scheduler.submit(
+            self.prefetch_subjects, (batch,),
+            key=key, priority=PRIORITY_USER,
+            on_done=lambda result: then(), on_error=lambda e: then()
+        )
 
     # --- Quiz Section ---
     def show_quiz(self):
-        self.clear_content()
-        self.fade_in_section()
-        label = ctk.CTkLabel(self.content_frame, text="AI Quiz Generator", font=("Arial", 24, "bold"), text_color="#F472B6")
+        with metrics.timed("ui_show", section="quiz"):
+            view = self.show_view("AI Quiz", self.build_quiz)
+            self.sync_subject_buttons(view, self.quiz_subject_buttons, "{} Quiz", self.start_quiz, self.quiz_area, self.quiz_info)
+
+    def build_quiz(self, view):
+        label = ctk.CTkLabel(view, text="AI Quiz Generator", font=("Arial", 24, "bold"), text_color="#F472B6")
         label.pack(pady=10)
-        if self.subjects_set:
-            for subject in sorted(self.subjects_set):
-                quiz_btn = ctk.CTkButton(self.content_frame, text=f"{subject} Quiz", command=lambda s=subject: self.start_quiz(s))
-                quiz_btn.pack(pady=8)
-        else:
-            info = ctk.CTkLabel(self.content_frame, text="Ask the chatbot to teach you a subject first!", font=("Arial", 16))
-            info.pack(pady=40)
+        self.quiz_info = ctk.CTkLabel(view, text="Ask the chatbot to teach you a subject first!", font=("Arial", 16))
+        self.quiz_info.pack(pady=40)
         # Quiz area
-        self.quiz_area = ctk.CTkFrame(self.content_frame)
+        self.quiz_area = ctk.CTkFrame(view)
         self.quiz_area.pack(pady=10, fill="both", expand=True)
 
-    def start_quiz(self, subject):
+    def start_quiz(self, subject, refresh=False):
         self.current_quiz_subject = subject
-        self.quiz_data = None
-        self.quiz_index = 0
-        self.quiz_score = 0
+        quiz = self.session.quiz
+        if (not refresh and quiz is not None and quiz.subject == subject
+                and self.quiz_ticket is not None and not self.quiz_ticket.done):
+            # Same quiz still generating: start it over from question 1 instead of generating it again
+            quiz.index = 0
+            quiz.score = 0
+            self.show_next_question()
+            return
+        quiz = self.session.start_quiz(subject)
+        self.quiz_waiting = True
         self.clear_quiz_area()
         loading = ctk.CTkLabel(self.quiz_area, text=f"Generating {subject} quiz... Please wait.", font=("Arial", 16))
         loading.pack(pady=20)
-        threading.Thread(target=self.fetch_quiz_questions, args=(subject,), daemon=True).start()
+        if self.quiz_ticket is not None:
+            self.quiz_ticket.cancel()
+        if not refresh:
+            ticket = self.after_prefetch(subject, lambda: self.submit_quiz(quiz, refresh))
+            if ticket is not None:
+                self.quiz_ticket = ticket
+                return
+        self.submit_quiz(quiz, refresh)
+
+    def submit_quiz(self, quiz, refresh=False):
+        self.quiz_ticket = self.scheduler.submit(
+            self.fetch_quiz_questions, (quiz, refresh),
+            priority=PRIORITY_USER,
+            on_done=self.on_quiz_ready,
+            on_error=lambda e: self.show_quiz_error(f"[Error generating quiz: {describe_error(e)}]")
+        )
 
     def clear_quiz_area(self):
         for widget in self.quiz_area.winfo_children():
             widget.destroy()
 
-    def fetch_quiz_questions(self, subject):
-        prompt = (
-            f"Create a 4-question multiple choice quiz about {subject}. "
-            "For each question, provide 4 answer choices (A, B, C, D) and indicate the correct answer. "
-            "Format the quiz as plain text, like this: "
-            "Question: ...\nA) ...\nB) ...\nC) ...\nD) ...\nAnswer: ...\nRepeat for all 4 questions."
-        )
-        try:
-            completion = client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "https://mindmate.local",
-                    "X-Title": "MindMate Study Assistant",
-                },
-                model="deepseek/deepseek-r1:free",
-                messages=[
-                    {"role": "system", "content": PLAIN_SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            quiz_text = completion.choices[0].message.content
-            print(f"[DEBUG] Quiz raw text for {subject}:\n", quiz_text)
-            self.quiz_data = self.parse_quiz(quiz_text)
-        except Exception as e:
-            self.quiz_data = None
-            self.quiz_area.after(0, self.show_quiz_error, f"[Error generating quiz: {e}]")
-            return
-        self.quiz_area.after(0, self.show_next_question)
-
-    def parse_quiz(self, text):
-        # Parse the quiz text into a list of dicts: [{question, choices, answer}]
-        questions = []
-        q_blocks = re.split(r'Question:', text)[1:]  # Skip any intro text
-        for block in q_blocks:
-            lines = block.strip().splitlines()
-            if len(lines) < 5:
-                continue
-            question = lines[0].strip()
-            choices = {}
-            for line in lines[1:5]:
-                if ")" in line:
-                    key, val = line.split(")", 1)
-                    choices[key.strip()] = val.strip()
-            answer = None
-            for line in lines[5:]:
-                if line.lower().startswith("answer:"):
-                    answer = line.split(":", 1)[-1].strip().upper()
-                    break
-            if question and choices and answer:
-                questions.append({"question": question, "choices": choices, "answer": answer})
-        return questions
+    def fetch_quiz_questions(self, quiz, refresh=False):
+        # Runs on a scheduler worker. The engine streams questions into quiz; each one that lands
+        # wakes the view in case the user is already waiting for it.
+        return self.run_engine(self.engine.generate_quiz(
+            self.session.id, quiz.subject, refresh, quiz=quiz,
+            on_question=lambda q, index, question: self.ui.post(self.on_quiz_question, q)
+        ))
+
+    def on_quiz_question(self, quiz):
+        if quiz is self.session.quiz and self.quiz_waiting:
+            self.show_next_question()
+
+    def on_quiz_ready(self, questions):
+        if self.quiz_waiting:
+            self.show_next_question()
 
     def show_next_question(self):
-        self.clear_quiz_area()
-        if not self.quiz_data or self.quiz_index >= len(self.quiz_data):
-            result = ctk.CTkLabel(self.quiz_area, text=f"Quiz complete! Your score: {self.quiz_score}/{len(self.quiz_data) if self.quiz_data else 4}", font=("Arial", 18))
-            result.pack(pady=30)
-            return
-        q = self.quiz_data[self.quiz_index]
-        q_label = ctk.CTkLabel(self.quiz_area, text=f"Q{self.quiz_index+1}: {q['question']}", font=("Arial", 16), wraplength=500, justify="left")
-        q_label.pack(pady=10)
-        self.selected_answer = tk.StringVar()
-        for key in ["A", "B", "C", "D"]:
-            if key in q["choices"]:
-                rb = ctk.CTkRadioButton(self.quiz_area, text=f"{key}) {q['choices'][key]}", variable=self.selected_answer, value=key)
-                rb.pack(anchor="w", padx=30, pady=2)
-        submit_btn = ctk.CTkButton(self.quiz_area, text="Submit", command=self.check_answer)
-        submit_btn.pack(pady=10)
-        self.feedback_label = ctk.CTkLabel(self.quiz_area, text="", font=("Arial", 14))
-        self.feedback_label.pack(pady=5)
+        with metrics.timed("ui_show", section="quiz_question"):
+            self.clear_quiz_area()
+            quiz = self.session.quiz
+            q = quiz.current()
+            self.quiz_waiting = q is None and not quiz.complete
+            if self.quiz_waiting:
+                loading = ctk.CTkLabel(self.quiz_area, text=f"Generating question {quiz.index + 1}... Please wait.", font=("Arial", 16))
+                loading.pack(pady=20)
+                return
+            if q is None:
+                result = ctk.CTkLabel(self.quiz_area, text=f"Quiz complete! Your score: {quiz.score}/{len(quiz.questions) if quiz.questions else 4}", font=("Arial", 18))
+                result.pack(pady=30)
+                new_btn = ctk.CTkButton(self.quiz_area, text="New Questions", command=lambda s=self.current_quiz_subject: self.start_quiz(s, refresh=True))
+                new_btn.pack(pady=5)
+                return
+            q_label = ctk.CTkLabel(self.quiz_area, text=f"Q{quiz.index+1}: {q['question']}", font=("Arial", 16), wraplength=500, justify="left")
+            q_label.pack(pady=10)
+            self.selected_answer = tk.StringVar()
+            for key in ["A", "B", "C", "D"]:
+                if key in q["choices"]:
+                    rb = ctk.CTkRadioButton(self.quiz_area, text=f"{key}) {q['choices'][key]}", variable=self.selected_answer, value=key)
+                    rb.pack(anchor="w", padx=30, pady=2)
+            self.submit_btn = ctk.CTkButton(self.quiz_area, text="Submit", command=self.check_answer)
+            self.submit_btn.pack(pady=10)
+            self.feedback_label = ctk.CTkLabel(self.quiz_area, text="", font=("Arial", 14))
+            self.feedback_label.pack(pady=5)
 
     def check_answer(self):
-        q = self.quiz_data[self.quiz_index]
         selected = self.selected_answer.get()
         if not selected:
             self.feedback_label.configure(text="Please select an answer.")
             return
-        if selected == q["answer"]:
+        # One answer per question: until the next one is shown, another click would answer it unseen
+        self.submit_btn.configure(state="disabled")
+        result = self.session.answer(selected)
+        if result["correct"]:
             self.feedback_label.configure(text="Correct!", text_color="green")
-            self.quiz_score += 1
         else:
-            correct_text = q["choices"].get(q["answer"], "")
-            self.feedback_label.configure(text=f"Wrong. Correct answer: {q['answer']}) {correct_text}", text_color="red")
-        self.quiz_index += 1
+            self.feedback_label.configure(text=f"Wrong. Correct answer: {result['answer']}) {result['answer_text']}", text_color="red")
         self.quiz_area.after(1200, self.show_next_question)
 
     def show_quiz_error(self, msg):
@@ -370,127 +634,142 @@ class YourAssistantApp(ctk.CTk):
 
     # --- To-Do List Section ---
     def show_todo(self):
-        self.clear_content()
-        self.fade_in_section()
-        label = ctk.CTkLabel(self.content_frame, text="AI To-Do List", font=("Arial", 24, "bold"), text_color="#34D399")
+        with metrics.timed("ui_show", section="todo"):
+            view = self.show_view("To-Do List", self.build_todo)
+            self.sync_subject_buttons(view, self.todo_subject_buttons, "{} To-Do List", self.show_todo_for_subject, self.todo_area, self.todo_info)
+
+    def build_todo(self, view):
+        label = ctk.CTkLabel(view, text="AI To-Do List", font=("Arial", 24, "bold"), text_color="#34D399")
         label.pack(pady=10)
-        if self.subjects_set:
-            for subject in sorted(self.subjects_set):
-                todo_btn = ctk.CTkButton(self.content_frame, text=f"{subject} To-Do List", command=lambda s=subject: self.show_todo_for_subject(s))
-                todo_btn.pack(pady=8)
-        else:
-            info = ctk.CTkLabel(self.content_frame, text="Ask the chatbot to teach you a subject first!", font=("Arial", 16))
-            info.pack(pady=40)
-        # To-Do area
-        self.todo_area = ctk.CTkFrame(self.content_frame)
+        self.todo_info = ctk.CTkLabel(view, text="Ask the chatbot to teach you a subject first!", font=("Arial", 16))
+        self.todo_info.pack(pady=40)
+        # To-Do area; its widgets are created once and reused for every subject
+        self.todo_area = ctk.CTkFrame(view)
         self.todo_area.pack(pady=10, fill="both", expand=True)
-
-    def show_todo_for_subject(self, subject):
-        self.current_todo_subject = subject
-        self.clear_todo_area()
-        self.todo_area.update()
-        # Fade-in animation for new tasks area
-        try:
-            self.todo_area.attributes('-alpha', 0)
-            for i in range(11):
-                alpha = i / 10
-                self.todo_area.attributes('-alpha', alpha)
-                self.todo_area.update()
-                self.todo_area.after(10)
-            self.todo_area.attributes('-alpha', 1)
-        except Exception:
-            pass
-        title = ctk.CTkLabel(self.todo_area, text=f"{subject} To-Do List", font=("Arial", 18, "bold"), text_color="#FBBF24")
-        title.pack(pady=5)
-        # If no tasks, generate with AI
-        if not self.todo_lists.get(subject):
-            loading = ctk.CTkLabel(self.todo_area, text="Generating to-do list... Please wait.", font=("Arial", 16))
-            loading.pack(pady=20)
-            threading.Thread(target=self.fetch_todo_tasks, args=(subject,), daemon=True).start()
-            return
+        self.todo_title = ctk.CTkLabel(self.todo_area, text="", font=("Arial", 18, "bold"), text_color="#FBBF24")
+        self.todo_status = ctk.CTkLabel(self.todo_area, text="", font=("Arial", 16))
         # Entry to add new task
-        entry_frame = ctk.CTkFrame(self.todo_area)
-        entry_frame.pack(pady=5)
-        new_task_var = tk.StringVar()
-        entry = ctk.CTkEntry(entry_frame, width=300, textvariable=new_task_var)
+        self.todo_entry_frame = ctk.CTkFrame(self.todo_area)
+        self.new_task_var = tk.StringVar()
+        entry = ctk.CTkEntry(self.todo_entry_frame, width=300, textvariable=self.new_task_var)
         entry.pack(side="left", padx=5)
-        add_btn = ctk.CTkButton(entry_frame, text="Add Task", command=lambda: self.add_todo_task(subject, new_task_var))
+        entry.bind("<Return>", lambda event: self.add_todo_task(self.current_todo_subject, self.new_task_var))
+        add_btn = ctk.CTkButton(self.todo_entry_frame, text="Add Task", command=lambda: self.add_todo_task(self.current_todo_subject, self.new_task_var))
         add_btn.pack(side="left", padx=5)
-        # Scrollable frame for tasks
-        canvas = tk.Canvas(self.todo_area, borderwidth=0, height=320)
-        scrollbar = ctk.CTkScrollbar(self.todo_area, orientation="vertical", command=canvas.yview)
-        scroll_frame = ctk.CTkFrame(canvas)
-        scroll_frame_id = canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        def on_frame_configure(event):
-            canvas.configure(scrollregion=canvas.bbox("all"))
-        scroll_frame.bind("<Configure>", on_frame_configure)
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        # List tasks in scrollable frame
-        self.todo_task_vars = []  # For checkboxes
-        for idx, item in enumerate(self.todo_lists[subject]):
-            var = tk.BooleanVar(value=item["done"])
-            cb = ctk.CTkCheckBox(scroll_frame, text=item["task"], variable=var, command=lambda i=idx, v=var: self.toggle_todo_task(subject, i, v))
-            cb.pack(anchor="w", padx=20, pady=2)
-            self.todo_task_vars.append(var)
-            del_btn = ctk.CTkButton(scroll_frame, text="Remove", width=60, command=lambda i=idx: self.remove_todo_task(subject, i))
-            del_btn.pack(anchor="w", padx=40, pady=1)
-
-    def clear_todo_area(self):
-        for widget in self.todo_area.winfo_children():
-            widget.destroy()
+        self.task_list = VirtualTaskList(
+            self.todo_area,
+            on_toggle=lambda idx, done: self.toggle_todo_task(self.current_todo_subject, idx, done),
+            on_remove=lambda idx: self.remove_todo_task(self.current_todo_subject, idx)
+        )
 
-    def fetch_todo_tasks(self, subject):
-        prompt = (
-            f"Give me a helpful, actionable to-do list for a student studying {subject}. "
-            "List 5-8 specific tasks or steps. Reply in plain text, one task per line, no numbering or bullets."
+    def show_todo_for_subject(self, subject):
+        with metrics.timed("ui_show", section="todo_subject"):
+            if subject != self.current_todo_subject and self.todo_ticket is not None:
+                # The previous subject's list (or the prefetch it was waiting on) is no longer wanted
+                self.todo_ticket.cancel()
+                self.todo_ticket = None
+            self.current_todo_subject = subject
+            self.todo_title.configure(text=f"{subject} To-Do List")
+            self.todo_title.pack(pady=5)
+            self.todo_status.pack_forget()
+            self.todo_entry_frame.pack_forget()
+            self.task_list.pack_forget()
+            # If no tasks, generate with AI
+            if not self.session.todo_lists.get(subject):
+                self.todo_status.configure(text="Generating to-do list... Please wait.", text_color=ctk.ThemeManager.theme["CTkLabel"]["text_color"])
+                self.todo_status.pack(pady=20)
+                if self.todo_ticket is not None:
+                    self.todo_ticket.cancel()
+                self.todo_ticket = (self.after_prefetch(subject, lambda: self.submit_todo(subject))
+                                    or self.submit_todo(subject))
+                return
+            self.todo_entry_frame.pack(pady=5)
+            self.task_list.pack(fill="both", expand=True)
+            self.task_list.set_items(self.session.todo_lists[subject])
+
+    def submit_todo(self, subject):
+        self.todo_ticket = self.scheduler.submit(
+            self.fetch_todo_tasks, (subject,),
+            key=("todo", subject), priority=PRIORITY_USER,
+            on_done=lambda tasks, s=subject: self.on_todo_ready(s, tasks),
+            on_error=lambda e, s=subject: self.on_todo_error(s, e)
         )
-        try:
-            completion = client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "https://mindmate.local",
-                    "X-Title": "MindMate Study Assistant",
-                },
-                model="deepseek/deepseek-r1:free",
-                messages=[
-                    {"role": "system", "content": PLAIN_SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            todo_text = completion.choices[0].message.content
-            print(f"[DEBUG] To-Do AI response for {subject}:\n", todo_text)
-            tasks = [line.strip() for line in todo_text.splitlines() if line.strip()]
-            self.todo_lists[subject] = [{"task": t, "done": False} for t in tasks]
-        except Exception as e:
-            self.todo_lists[subject] = []
-            self.todo_area.after(0, self.show_todo_error, f"[Error generating to-do list: {e}]")
+        return self.todo_ticket
+
+    def fetch_todo_tasks(self, subject, refresh=False):
+        # Runs on a scheduler worker; the engine stores the list in the session
+        return self.run_engine(self.engine.generate_todo(self.session.id, subject, refresh))
+
+    def on_todo_ready(self, subject, tasks):
+        if subject != self.current_todo_subject:
+            return  # The user has moved on to another subject
+        self.show_todo_for_subject(subject)
+
+    def on_todo_error(self, subject, error):
+        if subject != self.current_todo_subject:
             return
-        self.todo_area.after(0, lambda: self.show_todo_for_subject(subject))
+        self.session.todo_lists[subject] = []
+        self.show_todo_error(f"[Error generating to-do list: {describe_error(error)}]")
 
     def show_todo_error(self, msg):
-        self.clear_todo_area()
-        err = ctk.CTkLabel(self.todo_area, text=msg, font=("Arial", 14), text_color="red")
-        err.pack(pady=20)
+        self.todo_status.configure(text=msg, text_color="red")
 
     def add_todo_task(self, subject, new_task_var):
         task = new_task_var.get().strip()
-        if not task:
+        if not task or subject is None:
             return
-        self.todo_lists.setdefault(subject, []).append({"task": task, "done": False})
+        idx = self.session.add_task(subject, task)
         new_task_var.set("")
-        self.show_todo_for_subject(subject)
+        # Only the new row needs binding; the list itself stays in place
+        self.task_list.items_changed(idx)
+        self.task_list.canvas.yview_moveto(1.0)
 
-    def toggle_todo_task(self, subject, idx, var):
-        self.todo_lists[subject][idx]["done"] = var.get()
+    def toggle_todo_task(self, subject, idx, done):
+        if idx is not None:
+            self.session.set_task_done(subject, idx, done)
 
     def remove_todo_task(self, subject, idx):
-        del self.todo_lists[subject][idx]
-        self.show_todo_for_subject(subject)
+        if idx is None:
+            return
+        self.session.remove_task(subject, idx)
+        # Rows after the removed one shift up by one; rows above it are untouched
+        self.task_list.items_changed(idx)
+
+    # --- Stats panel (F12) ---
+    def toggle_stats_panel(self):
+        if self.stats_window is not None:
+            self.close_stats_panel()
+            return
+        self.stats_window = ctk.CTkToplevel(self)
+        self.stats_window.title("MindMate Stats")
+        self.stats_window.geometry("600x420")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.close_stats_panel)
+        self.stats_text = ctk.CTkTextbox(self.stats_window, font=("Courier", 13))
+        self.stats_text.pack(fill="both", expand=True, padx=10, pady=10)
+        self.refresh_stats_panel()
+
+    def refresh_stats_panel(self):
+        lines = [f"{'metric':<34}{'n':>6}{'p50':>10}{'p95':>10}"]
+        for key, (count, p50, p95) in metrics.summary().items():
+            lines.append(f"{key:<34}{count:>6}{p50:>10.1f}{p95:>10.1f}")
+        lines.append("")
+        lines.append(f"API jobs queued or running: {self.scheduler.pending_count()}")
+        self.stats_text.configure(state="normal")
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, "\n".join(lines))
+        self.stats_text.configure(state="disabled")
+        self.stats_after_id = self.after(STATS_REFRESH_MS, self.refresh_stats_panel)
+
+    def close_stats_panel(self):
+        if self.stats_after_id is not None:
+            self.after_cancel(self.stats_after_id)
+            self.stats_after_id = None
+        self.stats_window.destroy()
+        self.stats_window = None
 
 if __name__ == "__main__":
-    app = YourAssistantApp()
+    parser = argparse.ArgumentParser(description="MindMate study assistant")
+    parser.add_argument("--profile-startup", action="store_true", help="print how long each startup phase took, then exit")
+    args = parser.parse_args()
+    app = YourAssistantApp(profile_startup=args.profile_startup)
     app.mainloop() 
\ No newline at end of file
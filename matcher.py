@@ -0,0 +1,49 @@
+# Single-pass keyword matcher for subject extraction and intent detection
+# All terms are folded into a trie and compiled into one regex, so a message is scanned once no
+# matter how many terms there are (tens of thousands of subjects are fine). Terms only match on
+# whole words: "art" does not fire inside "start", nor "ai" inside "explain".
+import re
+
+
+def _trie_pattern(node):
+    # node: {char: child node}, with the "" key marking the end of a term
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    if len(branches) == 1 and "" not in node:
+        return branches[0]
+    body = "(?:" + "|".join(branches) + ")"
+    # Optional and greedy, so the longest term wins ("mathematics" over "math")
+    return body + "?" if "" in node else body
+
+
+class KeywordMatcher:
+    def __init__(self):
+        self.terms = {}  # {term: [(kind, label, rank)]}
+        self.next_rank = 0
+        self.regex = None
+
+    def add(self, kind, terms, label=None):
+        # Earlier terms rank higher when several of the same kind match
+        for term in terms:
+            term = term.strip().lower()
+            if not term:
+                continue
+            self.terms.setdefault(term, []).append((kind, label if label is not None else term, self.next_rank))
+            self.next_rank += 1
+        self.regex = None
+
+    def compile(self):
+        trie = {}
+        for term in self.terms:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+        self.regex = re.compile(r"(?<!\w)(?:" + (_trie_pattern(trie) or "(?!)") + r")(?!\w)")
+        return self.regex
+
+    def scan(self, text):
+        # Returns [(kind, label, rank)] for every term found, in text order; text should be lowercase
+        regex = self.regex or self.compile()
+        return [info for term in regex.findall(text) for info in self.terms[term]]
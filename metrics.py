@@ -0,0 +1,190 @@
+# Instrumentation: level-gated structured logs, rolling in-memory stats and an optional JSONL file
+# - log lines look like "api_call kind=chat ttft_ms=812.4 total_ms=5120.0 error=None"; the level
+#   comes from MINDMATE_LOG_LEVEL (default WARNING, so debug output costs nothing)
+# - every numeric field of an event is also kept in a bounded window per "event.field", which is
+#   what the stats panel's p50/p95 are computed from
+# - with a metrics path set, each event is appended as one JSON line; the file is rotated to
+#   <path>.1 once it grows past max_bytes
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger("mindmate")
+
+
+def setup_logging(level=None):
+    level = level or os.environ.get("MINDMATE_LOG_LEVEL", "WARNING")
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    log.setLevel(level.upper())
+
+
+def percentile(values, p):
+    # Nearest-rank percentile of an unsorted sequence
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(p / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+class Metrics:
+    def __init__(self, path=None, window=500, max_bytes=5 * 1024 * 1024):
+        self.path = path
+        self.window = window  # Most recent values kept per series
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.series = {}  # {"event.field": deque of values}
+        self.file = open(path, "a", encoding="utf-8") if path else None
+
+    def event(self, name, level=logging.INFO, **fields):
+        self.observe(name, **fields)
+        if log.isEnabledFor(level):
+            log.log(level, "%s %s", name, " ".join(f"{k}={v}" for k, v in fields.items()))
+        if self.file is not None:
+            self._write(dict(fields, event=name, ts=round(time.time(), 3)))
+
+    def observe(self, name, **fields):
+        # Stats only: for high-frequency samples that shouldn't hit the log or the file
+        with self.lock:
+            for field, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    key = f"{name}.{field}"
+                    if key not in self.series:
+                        self.series[key] = deque(maxlen=self.window)
+                    self.series[key].append(value)
+
+    def summary(self):
+        # {"event.field": (count, p50, p95)}
+        with self.lock:
+            snapshot = {key: list(values) for key, values in self.series.items()}
+        return {key: (len(v), percentile(v, 50), percentile(v, 95)) for key, v in sorted(snapshot.items())}
+
+    def call(self, kind, **fields):
+        return CallRecord(self, kind, fields)
+
+    def timed(self, name, **fields):
+        return Timed(self, name, fields)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            self.file.flush()
+            if self.file.tell() > self.max_bytes:
+                self.file.close()
+                os.replace(self.path, self.path + ".1")
+                self.file = open(self.path, "a", encoding="utf-8")
+
+
+class CallRecord:
+    # One API call: created when the work starts, finish() emits a single "api_call" event
+    def __init__(self, metrics, kind, fields):
+        self.metrics = metrics
+        self.fields = dict(fields, kind=kind)
+        self.started = time.perf_counter()
+        self.first_token_at = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def usage(self, usage):
+        if usage is not None:
+            self.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+    def finish(self, error=None):
+        now = time.perf_counter()
+        if self.first_token_at is not None:
+            self.fields["ttft_ms"] = round((self.first_token_at - self.started) * 1000, 1)
+        self.fields["total_ms"] = round((now - self.started) * 1000, 1)
+        self.fields["error"] = type(error).__name__ if error is not None else None
+        level = logging.WARNING if error is not None else logging.INFO
+        self.metrics.event("api_call", level=level, **self.fields)
+
+
+class Timed:
+    # with metrics.timed("ui_show", section="quiz"): ...  -> event with ms=<elapsed>
+    def __init__(self, metrics, name, fields):
+        self.metrics = metrics
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = round((time.perf_counter() - self.started) * 1000, 2)
+        self.metrics.event(self.name, level=logging.DEBUG, ms=ms, **self.fields)
+
+
+class LagMonitor:
+    # Measures how late Tk runs a timer callback: any lag means the main loop was busy (or blocked)
+    # for that long. Every sample feeds the stats; only lags past report_ms are logged/written.
+    def __init__(self, root, metrics, interval_ms=100, report_ms=50):
+        self.root = root
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self.report_ms = report_ms
+        self.expected = None
+        self.after_id = None
+
+    def start(self):
+        self.expected = time.perf_counter() + self.interval_ms / 1000
+        self.after_id = self.root.after(self.interval_ms, self.tick)
+
+    def stop(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def tick(self):
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self.expected) * 1000)
+        if lag_ms > self.report_ms:
+            self.metrics.event("ui_lag", level=logging.WARNING, lag_ms=round(lag_ms, 1))
+        else:
+            self.metrics.observe("ui_lag", lag_ms=lag_ms)
+        self.expected = now + self.interval_ms / 1000
+        self.after_id = self.root.after(self.interval_ms, self.tick)
+
+
+class StartupProfile:
+    # Startup timeline for --profile-startup: mark(label) ends the phase that began at the previous mark.
+    # Work done off the main thread (e.g. warming up the SDK) is added with its own duration.
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.phases = []  # [(label, seconds)] on the main thread, in order
+        self.background = []  # [(label, seconds)]
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.phases.append((label, now - self.last))
+        self.last = now
+
+    def add_background(self, label, seconds):
+        self.background.append((label, seconds))
+
+    def report(self):
+        lines = [f"{'startup phase':<36}{'ms':>9}"]
+        for label, seconds in self.phases:
+            lines.append(f"{label:<36}{seconds * 1000:>9.1f}")
+        lines.append(f"{'total':<36}{(self.last - self.started) * 1000:>9.1f}")
+        for label, seconds in self.background:
+            lines.append(f"{label + ' (background)':<36}{seconds * 1000:>9.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,192 @@
+# Local stand-in for the OpenRouter chat completions endpoint, for testing without network or quota
+# Serves canned quiz / to-do / batch / chat replies, streamed (SSE) or not, and can inject latency,
+# rate limits and server errors. Point the app at it with:
+#   python mock_openrouter.py --port 8765 --error-rate 0.2
+#   MINDMATE_API_BASE_URL=http://127.0.0.1:8765/api/v1 python main.py
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUIZ_REPLY = (
+    "Question: Which of these is a prime number?\nA) 4\nB) 6\nC) 7\nD) 9\nAnswer: C\n\n"
+    "Question: What is 3 squared?\nA) 6\nB) 9\nC) 12\nD) 27\nAnswer: B\n\n"
+    "Question: Which value is the largest?\nA) 0.5\nB) 0.05\nC) 0.55\nD) 0.505\nAnswer: C\n\n"
+    "Question: What is half of 18?\nA) 9\nB) 8\nC) 6\nD) 3\nAnswer: A\n"
+)
+TODO_REPLY = (
+    "Review your class notes from this week\n"
+    "Summarize each chapter in five sentences\n"
+    "Work through ten practice problems\n"
+    "Make flashcards for new terms\n"
+    "Take a timed practice quiz\n"
+    "Write down questions for your teacher\n"
+)
+CHAT_REPLY = (
+    "Here is a short explanation. Start with the core idea, then look at an example, "
+    "and finally try to explain it back in your own words. Would you like a practice question?"
+)
+
+
+def reply_for(prompt):
+    # Pick a canned reply that the app's parsers accept for the kind of prompt it sent
+    if "JSON object" in prompt:
+        match = re.search(r"subjects: (\[.*?\])", prompt)
+        subjects = json.loads(match.group(1)) if match else []
+        return json.dumps({s: {"quiz": QUIZ_REPLY, "todo": TODO_REPLY.splitlines()} for s in subjects})
+    if "multiple choice quiz" in prompt:
+        return QUIZ_REPLY
+    if "to-do list" in prompt:
+        return TODO_REPLY
+    return CHAT_REPLY
+
+
+def usage(prompt, content):
+    prompt_tokens, completion_tokens = len(prompt) // 4 + 1, len(content) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+class MockConfig:
+    def __init__(self, latency=0.05, chunk_delay=0.01, chunk_size=16, error_rate=0.0, error_status=429, retry_after=None):
+        self.latency = latency  # Seconds before the first byte (time to first token when streaming)
+        self.chunk_delay = chunk_delay  # Seconds between streamed chunks
+        self.chunk_size = chunk_size  # Characters per streamed chunk
+        self.error_rate = error_rate  # Fraction of requests answered with error_status
+        self.error_status = error_status
+        self.retry_after = retry_after  # Retry-After header (seconds) sent with 429s
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        config = self.server.config
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/chat/completions"):
+            return self.send_json(404, {"error": {"message": "not found"}})
+        request = json.loads(body or b"{}")
+        with config.lock:
+            config.requests += 1
+            fail = random.random() < config.error_rate
+            if fail:
+                config.errors += 1
+        time.sleep(config.latency)
+        if fail:
+            headers = {}
+            if config.error_status == 429 and config.retry_after is not None:
+                headers["Retry-After"] = str(config.retry_after)
+            return self.send_json(config.error_status, {"error": {"message": "mock upstream error", "code": config.error_status}}, headers)
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        content = reply_for(prompt)
+        model = request.get("model", "mock")
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self.send_stream(model, content, config, usage_for=prompt if include_usage else None)
+        else:
+            self.send_json(200, {
+                "id": "mock-1", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": usage(prompt, content),
+            })
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, model, content, config, usage_for=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [content[i:i + config.chunk_size] for i in range(0, len(content), config.chunk_size)]
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(config.chunk_delay)
+            chunk = {
+                "id": "mock-1", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        if usage_for is not None:
+            # Like OpenAI's stream_options.include_usage: a final chunk with no choices
+            chunk = {
+                "id": "mock-1", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [], "usage": usage(usage_for, content),
+            }
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockOpenRouter:
+    # In-process server: with MockOpenRouter(error_rate=0.3) as mock: ... mock.base_url
+    def __init__(self, host="127.0.0.1", port=0, **config):
+        self.server = ThreadingHTTPServer((host, port), MockHandler)
+        self.server.daemon_threads = True
+        self.server.config = MockConfig(**config)
+        self.thread = None
+
+    @property
+    def config(self):
+        return self.server.config
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-openrouter", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenRouter chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first byte")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+    mock = MockOpenRouter(
+        args.host, args.port, latency=args.latency, chunk_delay=args.chunk_delay,
+        error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+    )
+    print(f"Mock OpenRouter listening on {mock.base_url}")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.server.server_close()
@@ -0,0 +1,166 @@
+# Local question bank: every generated quiz question, per subject, with its review history
+# - near-duplicates are caught with MinHash signatures over the content words of the question and
+#   its correct answer, bucketed with LSH bands, so rewordings of a stored question aren't stored again
+# - each question sits in a Leitner box: a right answer moves it up a box and schedules the next
+#   review further out, a wrong one sends it back to box 0 for a review soon
+# - quizzes are assembled from the questions that are due; new ones are only needed when too few are
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+SIGNATURE_SIZE = 64  # MinHash values per question
+BAND_ROWS = 4  # 16 bands of 4 rows: pairs above ~0.6 similarity almost always share a bucket
+DUPLICATE_THRESHOLD = 0.6  # Estimated Jaccard similarity at which two questions count as the same
+REVIEW_INTERVALS = [0, 86400, 3 * 86400, 7 * 86400, 16 * 86400, 35 * 86400]  # Seconds until the next review, per box
+RETRY_DELAY = 600  # A wrongly answered question is due again after this many seconds
+
+# Fixed seed: signatures are stored on disk and must stay comparable between runs
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240518)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(SIGNATURE_SIZE)]
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Question phrasing that doesn't tell two questions apart ("Which of these is..." / "Which one of the following...")
+_FILLER_WORDS = {
+    "a", "an", "the", "of", "is", "are", "was", "were", "be", "to", "in", "on", "for", "and", "or", "it", "its",
+    "with", "by", "as", "at", "from", "what", "which", "who", "whom", "whose", "when", "where", "why", "how",
+    "this", "these", "that", "those", "one", "following", "does", "do", "did", "state", "states", "best", "true",
+}
+
+
+def question_words(question):
+    # What identifies a question: the content words of its stem and of its correct answer, with a
+    # crude plural strip so "numbers" matches "number"
+    answer = question["choices"].get(question["answer"], "")
+    words = set()
+    for word in _WORD_RE.findall(f"{question['question']} {answer}".lower()):
+        if word in _FILLER_WORDS:
+            continue
+        words.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return words or {question["question"].lower()}
+
+
+def signature(words):
+    hashes = [zlib.crc32(word.encode("utf-8")) for word in words]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a, sig_b):
+    # Fraction of matching MinHash values estimates the Jaccard similarity of the word sets
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def _bands(sig):
+    return [(i, tuple(sig[i:i + BAND_ROWS])) for i in range(0, len(sig), BAND_ROWS)]
+
+
+class QuestionBank:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY, subject TEXT, question TEXT, choices TEXT, answer TEXT, signature TEXT, "
+            "created REAL, box INTEGER DEFAULT 0, seen INTEGER DEFAULT 0, correct INTEGER DEFAULT 0, due REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS questions_subject_due ON questions (subject, due)")
+        self.conn.commit()
+        self.indexes = {}  # {subject: ({id: signature}, {band: set of ids})}, loaded on first use
+
+    def add(self, subject, question):
+        # Returns (id, True) for a new question, or (id of the stored near-duplicate, False)
+        subject = subject.lower()
+        sig = signature(question_words(question))
+        with self.lock:
+            signatures, buckets = self._index(subject)
+            candidates = set()
+            for band in _bands(sig):
+                candidates |= buckets.get(band, set())
+            best = max(candidates, key=lambda qid: similarity(sig, signatures[qid]), default=None)
+            if best is not None and similarity(sig, signatures[best]) >= DUPLICATE_THRESHOLD:
+                return best, False
+            now = time.time()
+            cursor = self.conn.execute(
+                "INSERT INTO questions (subject, question, choices, answer, signature, created, due) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (subject, question["question"], json.dumps(question["choices"]), question["answer"], json.dumps(sig), now, now),
+            )
+            self.conn.commit()
+            qid = cursor.lastrowid
+            self._remember(subject, qid, sig)
+        return qid, True
+
+    def pick(self, subject, n, exclude=(), due_only=True, now=None):
+        # Up to n questions, most in need of review first: missed ones, then new ones, then the
+        # lower boxes. With due_only=False, questions not yet due fill in, soonest due first.
+        now = time.time() if now is None else now
+        query = "SELECT id, question, choices, answer FROM questions WHERE subject = ?"
+        params = [subject.lower()]
+        if due_only:
+            query += " AND due <= ?"
+            params.append(now)
+        query += " ORDER BY due > ?, box, seen = 0, due LIMIT ?"
+        params += [now, n + len(exclude)]
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        picked = [
+            {"id": qid, "question": text, "choices": json.loads(choices), "answer": answer}
+            for qid, text, choices, answer in rows if qid not in exclude
+        ]
+        return picked[:n]
+
+    def record(self, question_id, correct, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            row = self.conn.execute("SELECT box FROM questions WHERE id = ?", (question_id,)).fetchone()
+            if row is None:
+                return
+            if correct:
+                box = min(row[0] + 1, len(REVIEW_INTERVALS) - 1)
+                due = now + REVIEW_INTERVALS[box]
+            else:
+                box, due = 0, now + RETRY_DELAY
+            self.conn.execute(
+                "UPDATE questions SET box = ?, due = ?, seen = seen + 1, correct = correct + ? WHERE id = ?",
+                (box, due, int(bool(correct)), question_id),
+            )
+            self.conn.commit()
+
+    def due_count(self, subject, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM questions WHERE subject = ? AND due <= ?", (subject.lower(), now)
+            ).fetchone()[0]
+
+    def stems(self, subject, limit=10):
+        # Most recently added question texts, for asking the model not to repeat them
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT question FROM questions WHERE subject = ? ORDER BY created DESC LIMIT ?", (subject.lower(), limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM questions")
+            self.conn.commit()
+            self.indexes = {}
+
+    def _index(self, subject):
+        # Caller holds the lock
+        if subject not in self.indexes:
+            self.indexes[subject] = ({}, {})
+            rows = self.conn.execute("SELECT id, signature FROM questions WHERE subject = ?", (subject,)).fetchall()
+            for qid, sig in rows:
+                self._remember(subject, qid, json.loads(sig))
+        return self.indexes[subject]
+
+    def _remember(self, subject, qid, sig):
+        signatures, buckets = self.indexes[subject]
+        signatures[qid] = sig
+        for band in _bands(sig):
+            buckets.setdefault(band, set()).add(qid)
@@ -0,0 +1,76 @@
+# Persistent on-disk cache for AI completions (quiz and to-do generation)
+# Entries are keyed on (model, system prompt, user prompt) and stored in a single SQLite file.
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=500):
+        self.path = path
+        self.ttl = ttl  # Seconds an entry stays valid (None = never expires)
+        self.max_entries = max_entries  # Least recently used entries are evicted past this size
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, content TEXT, created REAL, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model, system_prompt, user_prompt):
+        raw = json.dumps([model, system_prompt, user_prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, model, system_prompt, user_prompt):
+        key = self.make_key(model, system_prompt, user_prompt)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created = row
+            if self.ttl is not None and now - created > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return content
+
+    def put(self, model, system_prompt, user_prompt, content):
+        key = self.make_key(model, system_prompt, user_prompt)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self._evict()
+            self.conn.commit()
+
+    def invalidate(self, model, system_prompt, user_prompt):
+        key = self.make_key(model, system_prompt, user_prompt)
+        with self.lock:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+
+    def _evict(self):
+        # Caller holds the lock. Drop expired entries, then the least recently used ones over the limit.
+        if self.ttl is not None:
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if self.max_entries is not None and count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
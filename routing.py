@@ -0,0 +1,57 @@
+# Model routing: which model serves each kind of request, and when to hedge it
+# - every task ("chat", "quiz", "todo", ...) has a primary model and an optional fallback
+# - if the primary hasn't answered within the task's hedge deadline (first token when streaming,
+#   the whole reply otherwise), a backup request goes to the fallback; whichever answers first is
+#   used and the other is cancelled. A primary that fails outright also hands over to the fallback.
+# - the deadline follows the p95 of the primary's recent latency, so only about the slowest 5% of
+#   requests are hedged. Requests cancelled for losing count at the time they were cancelled, which
+#   keeps the slow tail in the window instead of letting the deadline drift down.
+import threading
+from collections import deque
+
+from metrics import percentile
+
+
+class ModelRoute:
+    def __init__(self, primary, fallback=None):
+        self.primary = primary
+        self.fallback = fallback if fallback != primary else None
+
+    def __repr__(self):
+        return f"ModelRoute({self.primary!r}, {self.fallback!r})"
+
+
+def parse_route(spec):
+    # "primary" or "primary,fallback", e.g. from an environment variable
+    models = [m.strip() for m in spec.split(",") if m.strip()]
+    if not models:
+        raise ValueError(f"no model in route {spec!r}")
+    return ModelRoute(models[0], models[1] if len(models) > 1 else None)
+
+
+class ModelRouter:
+    def __init__(self, routes, default_deadline=8.0, min_deadline=1.5, max_deadline=30.0, window=200, min_samples=20):
+        self.routes = dict(routes)  # {task: ModelRoute}; "default" covers tasks without their own route
+        self.default_deadline = default_deadline  # Seconds, until min_samples latencies are known
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.window = window
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies = {}  # {task: deque of the primary's seconds to answer}
+
+    def route(self, task):
+        return self.routes.get(task) or self.routes["default"]
+
+    def deadline(self, task):
+        with self.lock:
+            samples = list(self.latencies.get(task, ()))
+        if len(samples) < self.min_samples:
+            return self.default_deadline
+        return min(self.max_deadline, max(self.min_deadline, percentile(samples, 95)))
+
+    def observe(self, task, seconds):
+        with self.lock:
+            if task not in self.latencies:
+                self.latencies[task] = deque(maxlen=self.window)
+            self.latencies[task].append(seconds)
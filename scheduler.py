@@ -0,0 +1,147 @@
+# Request scheduler shared by all API traffic
+# - a bounded pool of worker threads instead of one thread per click
+# - identical requests (same key) that are still queued or running share a single call
+# - lower priority numbers run first, so chat goes ahead of background generation
+# - tickets can be cancelled; a cancelled ticket never gets its callback, and a queued
+#   job whose tickets are all cancelled is dropped without running
+import heapq
+import itertools
+import threading
+import time
+
+PRIORITY_CHAT = 0
+PRIORITY_USER = 1
+PRIORITY_BACKGROUND = 2
+
+_current = threading.local()
+
+
+def current_queue_wait():
+    # Seconds the job running on this worker thread spent queued; None outside a worker
+    return getattr(_current, "queue_wait", None)
+
+
+class _Job:
+    def __init__(self, fn, args, key, priority):
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.priority = priority
+        self.tickets = []
+        self.started = False
+        self.submitted = time.monotonic()
+
+    def all_cancelled(self):
+        return all(t.cancelled for t in self.tickets)
+
+
+class Ticket:
+    def __init__(self, scheduler, job, on_done, on_error):
+        self.scheduler = scheduler
+        self.job = job
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+
+class RequestScheduler:
+    def __init__(self, max_workers=3, dispatch=None):
+        # dispatch(fn, *args) decides where callbacks run (e.g. on the Tk main loop).
+        # Cancellation is checked again inside the dispatched call, so cancelling from
+        # that same thread never races with delivery.
+        self.dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self.cond = threading.Condition()
+        self.heap = []
+        self.seq = itertools.count()
+        self.inflight = {}  # {key: _Job} for keyed jobs still queued or running
+        self.jobs = set()  # Every job not yet finished
+        self.closed = False
+        self.workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"api-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, fn, args=(), key=None, priority=PRIORITY_USER, on_done=None, on_error=None):
+        with self.cond:
+            job = self.inflight.get(key) if key is not None else None
+            if job is None:
+                job = _Job(fn, args, key, priority)
+                self.jobs.add(job)
+                if key is not None:
+                    self.inflight[key] = job
+                heapq.heappush(self.heap, (priority, next(self.seq), job))
+                self.cond.notify()
+            elif priority < job.priority and not job.started:
+                # Promote a queued duplicate; the stale heap entry is skipped once the job has started
+                job.priority = priority
+                heapq.heappush(self.heap, (priority, next(self.seq), job))
+                self.cond.notify()
+            ticket = Ticket(self, job, on_done, on_error)
+            job.tickets.append(ticket)
+        return ticket
+
+    def cancel(self, ticket):
+        with self.cond:
+            ticket.cancelled = True
+
+    def pending_count(self):
+        with self.cond:
+            return len(self.jobs)
+
+    def shutdown(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def _next_job(self):
+        with self.cond:
+            while True:
+                while not self.heap and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return None
+                _, _, job = heapq.heappop(self.heap)
+                if job.started or job not in self.jobs:
+                    continue  # Stale entry left behind by a promotion
+                if job.all_cancelled():
+                    self._forget(job)
+                    continue
+                job.started = True
+                return job
+
+    def _forget(self, job):
+        # Caller holds the lock
+        self.jobs.discard(job)
+        if job.key is not None and self.inflight.get(job.key) is job:
+            del self.inflight[job.key]
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            _current.queue_wait = time.monotonic() - job.submitted
+            try:
+                result = job.fn(*job.args)
+                ok = True
+            except Exception as e:
+                result = e
+                ok = False
+            with self.cond:
+                self._forget(job)
+                tickets = [t for t in job.tickets if not t.cancelled]
+            for ticket in tickets:
+                self.dispatch(self._deliver, ticket, ok, result)
+
+    def _deliver(self, ticket, ok, result):
+        if ticket.cancelled or ticket.done:
+            return
+        ticket.done = True
+        callback = ticket.on_done if ok else ticket.on_error
+        if callback is not None:
+            callback(result)
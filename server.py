@@ -0,0 +1,212 @@
+# Headless front ends for the MindMate engine: a small JSON-over-HTTP server and a terminal REPL
+# Both run every session on one event loop, so many users share the engine's upstream limit,
+# connection pool, response cache and in-flight dedup.
+#   python server.py --port 8080
+#     POST /sessions/<id>/chat    {"message": "..."}
+#     POST /sessions/<id>/quiz    {"subject": "Physics", "refresh": false}
+#     POST /sessions/<id>/answer  {"choice": "B"}
+#     POST /sessions/<id>/todo    {"subject": "Physics", "refresh": false}
+#     DELETE /sessions/<id>
+#     GET /stats
+#   python server.py --cli
+import argparse
+import asyncio
+import json
+import re
+import sys
+
+from engine import MindMate, describe_error, metrics, log
+
+MAX_BODY_BYTES = 64 * 1024
+REQUEST_TIMEOUT = 30  # Seconds allowed to send the request line, headers and body
+
+_ROUTE_RE = re.compile(r"^/sessions/([\w.-]+)(?:/(chat|quiz|answer|todo))?$")
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 502: "Bad Gateway"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def public_question(question):
+    # Quiz questions as sent to clients: the answer stays on the server until it's checked
+    return {"question": question["question"], "choices": question["choices"]}
+
+
+class MindMateServer:
+    def __init__(self, engine=None):
+        self.engine = engine or MindMate()
+
+    async def handle(self, reader, writer):
+        # One request per connection (Connection: close keeps the parser trivial)
+        try:
+            method, path, body = await asyncio.wait_for(self.read_request(reader), REQUEST_TIMEOUT)
+            status, payload = 200, await self.route(method, path, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except asyncio.TimeoutError:
+            writer.close()
+            return
+        except Exception as e:
+            log.exception("Request failed")
+            status, payload = 502, {"error": describe_error(e)}
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n"
+            .encode("ascii") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise HttpError(400, "malformed request line")
+        method, path, _ = request_line
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                try:
+                    length = int(value.strip() or 0)
+                except ValueError:
+                    raise HttpError(400, "invalid Content-Length")
+                if length < 0:
+                    raise HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "request body too large")
+        raw = await reader.readexactly(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            raise HttpError(400, "body must be JSON")
+        if not isinstance(body, dict):
+            raise HttpError(400, "body must be a JSON object")
+        return method, path.split("?", 1)[0], body
+
+    async def route(self, method, path, body):
+        if path == "/stats":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            return {
+                "sessions": len(self.engine.sessions),
+                "metrics": {key: {"n": n, "p50": p50, "p95": p95} for key, (n, p50, p95) in metrics.summary().items()},
+            }
+        match = _ROUTE_RE.match(path)
+        if match is None:
+            raise HttpError(404, "not found")
+        session_id, action = match.groups()
+        if action is None:
+            if method != "DELETE":
+                raise HttpError(405, "use DELETE")
+            self.engine.end_session(session_id)
+            return {"ended": session_id}
+        if method != "POST":
+            raise HttpError(405, "use POST")
+        if action == "chat":
+            return await self.engine.chat(session_id, self.field(body, "message"))
+        if action == "quiz":
+            questions = await self.engine.generate_quiz(session_id, self.field(body, "subject"), bool(body.get("refresh")))
+            return {"questions": [public_question(q) for q in questions]}
+        if action == "answer":
+            try:
+                return await self.engine.answer_question(session_id, self.field(body, "choice"))
+            except ValueError as e:
+                raise HttpError(409, str(e))
+        tasks = await self.engine.generate_todo(session_id, self.field(body, "subject"), bool(body.get("refresh")))
+        return {"tasks": tasks}
+
+    def field(self, body, name):
+        value = body.get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise HttpError(400, f"missing \"{name}\"")
+        return value.strip()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"MindMate engine listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            await server.serve_forever()
+
+
+CLI_HELP = "Commands: /quiz <subject>, /answer <A-D>, /todo <subject>, /stats, /quit. Anything else is chat."
+
+async def run_cli(engine, session_id="cli"):
+    loop = asyncio.get_running_loop()
+    print(CLI_HELP)
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            return
+        command, _, arg = line.strip().partition(" ")
+        arg = arg.strip()
+        try:
+            if command == "/quit":
+                return
+            elif command == "/quiz" and arg:
+                questions = await engine.generate_quiz(session_id, arg.capitalize())
+                print(f"{len(questions)} questions ready.")
+                show_question(engine.session(session_id).quiz)
+            elif command == "/answer" and arg:
+                result = await engine.answer_question(session_id, arg)
+                print("Correct!" if result["correct"] else f"Wrong. Correct answer: {result['answer']}) {result['answer_text']}")
+                quiz = engine.session(session_id).quiz
+                if result["finished"]:
+                    print(f"Quiz complete! Your score: {quiz.score}/{len(quiz.questions)}")
+                else:
+                    show_question(quiz)
+            elif command == "/todo" and arg:
+                for task in await engine.generate_todo(session_id, arg.capitalize()):
+                    print(f"[{'x' if task['done'] else ' '}] {task['task']}")
+            elif command == "/stats":
+                for key, (n, p50, p95) in metrics.summary().items():
+                    print(f"{key:<34}{n:>6}{p50:>10.1f}{p95:>10.1f}")
+            elif command.startswith("/"):
+                print(CLI_HELP)
+            elif line.strip():
+                await chat_cli(engine, session_id, line.strip())
+        except ValueError as e:
+            print(e)
+        except Exception as e:
+            print(f"[Error: {describe_error(e)}]")
+
+async def chat_cli(engine, session_id, message):
+    session = engine.session(session_id)
+    turn = session.begin_turn(message)
+    if turn.canned_reply:
+        print(f"Assistant: {turn.canned_reply}")
+    print("Assistant: ", end="", flush=True)
+    reply, error = await engine.reply(session, turn, on_text=lambda text: print(text, end="", flush=True))
+    print(error or "")
+
+def show_question(quiz):
+    q = quiz.current()
+    if q is None:
+        return
+    print(f"Q{quiz.index + 1}: {q['question']}")
+    for key, text in q["choices"].items():
+        print(f"  {key}) {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MindMate engine server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--cli", action="store_true", help="chat in the terminal instead of serving HTTP")
+    args = parser.parse_args()
+    try:
+        if args.cli:
+            asyncio.run(run_cli(MindMate(idle_timeout=None)))
+        else:
+            asyncio.run(MindMateServer().serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,5 @@
+# Tests never read or fill the user's response cache or question bank
+import os
+
+os.environ.setdefault("MINDMATE_NO_CACHE", "1")
+os.environ.setdefault("MINDMATE_NO_BANK", "1")
@@ -0,0 +1,83 @@
+# clean_ai_response and the streaming MarkdownCleaner against the original six-pass cleanup
+# (legacy_clean_ai_response in benchmarks/bench_cleaner.py), on the recorded replies and on
+# the cases where stars that pair up change how headers and backticks come out
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_cleaner import legacy_clean_ai_response, load_replies
+from engine import clean_ai_response, MarkdownCleaner, MAX_HELD_CODE
+
+CASES = [
+    "a#* a",  # A header mark stops at a star the bold/italic passes leave behind
+    "a#*\nb",
+    "*`*`",  # The stars pair up first, leaving an empty `` that isn't code
+    "**#** a",  # ...and here they're gone before the header mark eats the space
+    "#*#* a",
+    "# ** a **",
+    "#` **` a",
+    "`**`x`",
+    "## **Bold title**\n\n* one\n* two",
+    "***a*** b ** c",
+    "x*y ** z*",
+]
+
+
+def stream(text, sizes):
+    cleaner = MarkdownCleaner()
+    out = []
+    pos = 0
+    while pos < len(text):
+        size = next(sizes)
+        out.append(cleaner.feed(text[pos:pos + size]))
+        pos += size
+    out.append(cleaner.finish())
+    return "".join(out)
+
+
+def chunk_sizes(seed):
+    rng = random.Random(seed)
+    while True:
+        yield rng.randint(1, 12)
+
+
+def one_by_one():
+    while True:
+        yield 1
+
+
+@pytest.mark.parametrize("text", CASES + load_replies())
+def test_matches_original(text):
+    expected = legacy_clean_ai_response(text)
+    assert clean_ai_response(text) == expected
+    assert stream(text, one_by_one()) == expected
+    for seed in range(5):
+        assert stream(text, chunk_sizes(seed)) == expected
+
+
+def test_matches_original_on_random_markdown():
+    rng = random.Random(7)
+    tokens = ["*", "**", "#", "## ", "`", "```", " ", "\n", "\n\n", "a", "b c", "- "]
+    for _ in range(3000):
+        text = "".join(rng.choice(tokens) for _ in range(rng.randint(1, 20)))
+        expected = legacy_clean_ai_response(text)
+        assert clean_ai_response(text) == expected, text
+        assert stream(text, chunk_sizes(rng.random())) == expected, text
+
+
+def test_stray_backtick_does_not_stall_the_stream():
+    cleaner = MarkdownCleaner()
+    shown = cleaner.feed("Use a ` here. " + "More text. " * 40)
+    assert len(shown) > MAX_HELD_CODE
+    assert shown.startswith("Use a ` here.")
+
+
+def test_unpaired_star_does_not_hold_back_what_follows():
+    cleaner = MarkdownCleaner()
+    assert cleaner.feed("* First point, with no star after it\nand more") == "First point, with no star after it\nand more"
@@ -0,0 +1,100 @@
+# QuestionBank: near-duplicate detection and the Leitner box scheduling that decides what a quiz asks
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from question_bank import QuestionBank, REVIEW_INTERVALS, RETRY_DELAY
+
+DAY = 86400
+
+
+def make_question(text, answer):
+    return {"question": text, "choices": {"A": answer, "B": "None of these"}, "answer": "A"}
+
+
+@pytest.fixture
+def bank(tmp_path):
+    bank = QuestionBank(str(tmp_path / "questions.sqlite3"))
+    yield bank
+    bank.conn.close()
+
+
+def box_and_due(bank, qid):
+    return bank.conn.execute("SELECT box, due FROM questions WHERE id = ?", (qid,)).fetchone()
+
+
+def test_reworded_duplicate_is_rejected(bank):
+    qid, added = bank.add("Python", make_question("Which data type in Python is immutable?", "Tuple"))
+    assert added
+    assert bank.add("python", make_question("Which of the following Python data types is immutable?", "Tuples")) == (qid, False)
+    # Same wording with a different answer, and a different question, are both kept
+    assert bank.add("Python", make_question("Which data type in Python is mutable?", "List"))[1]
+    assert bank.add("Python", make_question("Which keyword defines a function in Python?", "def"))[1]
+    # Subjects don't share questions
+    assert bank.add("Java", make_question("Which data type in Python is immutable?", "Tuple"))[1]
+    assert bank.due_count("python", now=2e9) == 3
+
+
+def test_duplicates_are_found_after_reopening(tmp_path):
+    path = str(tmp_path / "questions.sqlite3")
+    first = QuestionBank(path)
+    qid, _ = first.add("Python", make_question("Which data type in Python is immutable?", "Tuple"))
+    first.conn.close()
+    second = QuestionBank(path)
+    assert second.add("Python", make_question("What Python data type is immutable?", "Tuple")) == (qid, False)
+    second.conn.close()
+
+
+def test_wrong_answer_is_due_again_after_retry_delay(bank):
+    qid, _ = bank.add("Math", make_question("What is 7 times 8?", "56"))
+    now = 2e9
+    bank.record(qid, True, now=now)
+    bank.record(qid, False, now=now)
+    assert box_and_due(bank, qid) == (0, now + RETRY_DELAY)
+    assert bank.pick("Math", 5, now=now + RETRY_DELAY - 1) == []
+    assert [q["id"] for q in bank.pick("Math", 5, now=now + RETRY_DELAY)] == [qid]
+
+
+def test_right_answer_moves_up_a_box(bank):
+    qid, _ = bank.add("Math", make_question("What is 7 times 8?", "56"))
+    now = 2e9
+    bank.record(qid, True, now=now)
+    assert box_and_due(bank, qid) == (1, now + REVIEW_INTERVALS[1])
+    assert bank.pick("Math", 5, now=now + REVIEW_INTERVALS[1] - 1) == []
+    now += REVIEW_INTERVALS[1]
+    bank.record(qid, True, now=now)
+    assert box_and_due(bank, qid) == (2, now + REVIEW_INTERVALS[2])
+    for _ in range(len(REVIEW_INTERVALS)):
+        bank.record(qid, True, now=now)
+    assert box_and_due(bank, qid) == (len(REVIEW_INTERVALS) - 1, now + REVIEW_INTERVALS[-1])
+
+
+def test_pick_orders_missed_then_new_then_higher_boxes(bank):
+    now = 2e9
+    ids = {}
+    for name, text in [("box2", "Capital of France"), ("new", "Largest planet in the solar system"),
+                       ("box1", "Chemical symbol for gold"), ("missed", "Speed of light in vacuum")]:
+        ids[name], _ = bank.add("Science", make_question(text, name))
+    bank.record(ids["box2"], True, now=now - 10 * DAY)
+    bank.record(ids["box2"], True, now=now - 10 * DAY)
+    bank.record(ids["box1"], True, now=now - 2 * DAY)
+    bank.record(ids["missed"], False, now=now - DAY)
+    picked = [q["id"] for q in bank.pick("Science", 4, now=now)]
+    assert picked == [ids["missed"], ids["new"], ids["box1"], ids["box2"]]
+    assert [q["id"] for q in bank.pick("Science", 2, exclude={ids["missed"]}, now=now)] == [ids["new"], ids["box1"]]
+
+
+def test_pick_fills_in_with_questions_not_yet_due(bank):
+    now = 2e9
+    soon, _ = bank.add("Art", make_question("Who painted the Mona Lisa?", "Leonardo"))
+    later, _ = bank.add("Art", make_question("Which movement did Monet belong to?", "Impressionism"))
+    due, _ = bank.add("Art", make_question("What are the three primary colours?", "Red, yellow, blue"))
+    bank.record(later, True, now=now)
+    bank.record(later, True, now=now)
+    bank.record(soon, True, now=now)
+    assert [q["id"] for q in bank.pick("Art", 3, now=now)] == [due]
+    assert [q["id"] for q in bank.pick("Art", 3, due_only=False, now=now)] == [due, soon, later]
@@ -0,0 +1,96 @@
+# QuizStreamParser / parse_quiz on the layouts models actually reply with, fed whole and in chunks
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine import QuizStreamParser, parse_quiz
+
+PROMPT_FORMAT = (
+    "Question: What does len([1, 2]) return?\nA) 1\nB) 2\nC) 3\nD) An error\nAnswer: B\n"
+    "Question: Which keyword defines a function?\nA) func\nB) def\nC) fn\nD) lambda\nAnswer: B\n"
+)
+EXPECTED_PROMPT_FORMAT = [
+    {"question": "What does len([1, 2]) return?", "choices": {"A": "1", "B": "2", "C": "3", "D": "An error"}, "answer": "B"},
+    {"question": "Which keyword defines a function?", "choices": {"A": "func", "B": "def", "C": "fn", "D": "lambda"}, "answer": "B"},
+]
+
+MARKDOWN = """## Python Quiz
+
+**Question 1:** What is 2 + 6?
+
+A. 6
+B. 8
+C. 9
+D. 5
+
+**Answer:** B
+
+### Question 2:
+Which of these is a list?
+(A) (1, 2)
+(B) {1, 2}
+(C) [1, 2]
+(D) "12"
+
+Correct answer: (c)
+"""
+
+LAYOUTS = [
+    (PROMPT_FORMAT, EXPECTED_PROMPT_FORMAT),
+    (MARKDOWN, [
+        {"question": "What is 2 + 6?", "choices": {"A": "6", "B": "8", "C": "9", "D": "5"}, "answer": "B"},
+        {"question": "Which of these is a list?", "choices": {"A": "(1, 2)", "B": "{1, 2}", "C": "[1, 2]", "D": "\"12\""}, "answer": "C"},
+    ]),
+    ("Q1. Capital of France?\na: Paris\nb: Rome\nc: Madrid\nd: Berlin\nAnswer - a\n"
+     "2) Largest planet?\na) Mars\nb) Jupiter\nc) Venus\nd) Earth\nAnswer: B) Jupiter", [
+        {"question": "Capital of France?", "choices": {"A": "Paris", "B": "Rome", "C": "Madrid", "D": "Berlin"}, "answer": "A"},
+        {"question": "Largest planet?", "choices": {"A": "Mars", "B": "Jupiter", "C": "Venus", "D": "Earth"}, "answer": "B"},
+    ]),
+    ("Question 3:\nAnswer a quick one: which gas do plants take in\nfrom the air?\nA) Oxygen\nB) Carbon dioxide\nC) Helium\nD) Neon\nAnswer: B\n", [
+        {"question": "Answer a quick one: which gas do plants take in from the air?",
+         "choices": {"A": "Oxygen", "B": "Carbon dioxide", "C": "Helium", "D": "Neon"}, "answer": "B"},
+    ]),
+]
+
+
+@pytest.mark.parametrize("text, expected", LAYOUTS)
+def test_layouts(text, expected):
+    assert parse_quiz(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", LAYOUTS)
+def test_chunked_feed_matches_whole(text, expected):
+    rng = random.Random(len(text))
+    for sizes in ([1] * len(text), [rng.randint(1, 15) for _ in text]):
+        parser = QuizStreamParser()
+        questions = []
+        pos = 0
+        for size in sizes:
+            if pos >= len(text):
+                break
+            questions += parser.feed(text[pos:pos + size])
+            pos += size
+        questions += parser.finish()
+        assert questions == expected
+
+
+def test_question_is_returned_once_its_answer_line_ends():
+    parser = QuizStreamParser()
+    assert parser.feed("Question: 1 + 1?\nA) 1\nB) 2\nC) 3\nD) 4\nAnswer: B") == []
+    assert parser.feed("\nQuestion: Next") == [
+        {"question": "1 + 1?", "choices": {"A": "1", "B": "2", "C": "3", "D": "4"}, "answer": "B"}
+    ]
+
+
+def test_incomplete_questions_are_dropped():
+    text = (
+        "Question: Never answered?\nA) x\nB) y\n"  # Dropped by the next heading
+        "Question: Answer isn't a choice?\nA) x\nB) y\nAnswer: D\n"
+        "Question: Fine?\nA) yes\nB) no\nAnswer: A\n"
+    )
+    assert parse_quiz(text) == [{"question": "Fine?", "choices": {"A": "yes", "B": "no"}, "answer": "A"}]
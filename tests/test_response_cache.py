@@ -0,0 +1,78 @@
+# ResponseCache: TTL expiry, LRU eviction past max_entries and invalidate, with a fake clock
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from response_cache import ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 2e9
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResponseCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put("m", "system", "quiz on python", "Question: ...")
+    clock.now += 60
+    assert cache.get("m", "system", "quiz on python") == "Question: ..."  # Reading doesn't extend the TTL
+    clock.now += 1
+    assert cache.get("m", "system", "quiz on python") is None
+    assert cache.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def test_expired_entries_are_dropped_on_put(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=60)
+    cache.put("m", "system", "old", "old reply")
+    clock.now += 61
+    cache.put("m", "system", "new", "new reply")
+    assert cache.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 1
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=None, max_entries=2)
+    cache.put("m", "system", "a", "reply a")
+    clock.now += 1
+    cache.put("m", "system", "b", "reply b")
+    clock.now += 1
+    assert cache.get("m", "system", "a") == "reply a"  # a is now more recently used than b
+    clock.now += 1
+    cache.put("m", "system", "c", "reply c")
+    assert cache.get("m", "system", "b") is None
+    assert cache.get("m", "system", "a") == "reply a"
+    assert cache.get("m", "system", "c") == "reply c"
+
+
+def test_invalidate_drops_only_that_entry(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put("m", "system", "quiz on python", "python quiz")
+    cache.put("m", "system", "quiz on java", "java quiz")
+    cache.put("other-model", "system", "quiz on python", "other model's quiz")
+    cache.invalidate("m", "system", "quiz on python")
+    assert cache.get("m", "system", "quiz on python") is None
+    assert cache.get("m", "system", "quiz on java") == "java quiz"
+    assert cache.get("other-model", "system", "quiz on python") == "other model's quiz"
+
+
+def test_entries_survive_reopening(tmp_path, clock):
+    make_cache(tmp_path).put("m", "system", "todo for math", "1. Practice")
+    assert make_cache(tmp_path).get("m", "system", "todo for math") == "1. Practice"
@@ -0,0 +1,90 @@
+# Model routing and hedged requests in the engine (routing.py, MindMate._race), against the fake
+# SDK clients with per-model latency and failures
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_openai import FakeBackend
+from engine import MindMate
+from routing import ModelRoute, ModelRouter, parse_route
+from transport import Transport, RetryPolicy, CircuitBreaker
+
+
+def make_engine(models, fallback="fallback", deadline=0.2, threshold=5):
+    backend = FakeBackend(latency=0.01, models=models, seed=3)
+    transport = Transport("fake", "test-key", retry=RetryPolicy(2, 0.001, 0.01), breaker=CircuitBreaker(threshold, 30.0),
+                          client=backend.client(), async_client=backend.async_client())
+    router = ModelRouter({"default": ModelRoute("primary", fallback)}, default_deadline=deadline,
+                         min_deadline=0.01, min_samples=5)
+    return backend, MindMate(transport=transport, cache=None, bank=None, router=router, idle_timeout=None)
+
+
+def test_parse_route():
+    route = parse_route(" fast-model , slow-model ")
+    assert (route.primary, route.fallback) == ("fast-model", "slow-model")
+    assert parse_route("only").fallback is None
+    assert ModelRoute("same", "same").fallback is None
+    with pytest.raises(ValueError):
+        parse_route(" , ")
+
+
+def test_deadline_follows_p95_within_bounds():
+    router = ModelRouter({"default": ModelRoute("a")}, default_deadline=8.0, min_deadline=1.0, max_deadline=5.0, min_samples=20)
+    assert router.deadline("chat") == 8.0
+    for i in range(100):
+        router.observe("chat", 2.0 if i < 95 else 60.0)
+    assert router.deadline("chat") == 2.0
+    for _ in range(router.window):
+        router.observe("chat", 0.1)
+    assert router.deadline("chat") == 1.0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    backend, engine = make_engine({"primary": {"latency": 5.0}})
+
+    async def run():
+        start = time.perf_counter()
+        reply = await engine.chat("s", "explain photosynthesis")
+        return reply, time.perf_counter() - start
+
+    reply, elapsed = asyncio.run(run())
+    assert reply["error"] is None and reply["reply"]
+    assert elapsed < 1.0
+    assert backend.calls_by_model == {"primary": 1, "fallback": 1}
+
+
+def test_failing_primary_hands_over_without_waiting_for_the_deadline():
+    backend, engine = make_engine({"primary": {"error_rate": 1.0, "error_status": 400}}, deadline=5.0)
+    start = time.perf_counter()
+    tasks = asyncio.run(engine.generate_todo("s", "Physics"))
+    assert tasks
+    assert time.perf_counter() - start < 1.0
+    assert backend.calls_by_model["fallback"] == 1
+
+
+def test_open_breaker_on_primary_does_not_block_fallback():
+    backend, engine = make_engine({"primary": {"error_rate": 1.0, "error_status": 503}}, threshold=2)
+
+    async def run():
+        return await asyncio.gather(*(engine.generate_todo(f"s{i}", f"Subject {i}") for i in range(10)))
+
+    results = asyncio.run(run())
+    assert all(results)
+    assert backend.calls_by_model["fallback"] == 10
+    assert engine.transport.breaker_for("primary").state == "open"
+    assert engine.transport.breaker_for("fallback").state == "closed"
+
+
+def test_error_when_every_model_fails():
+    backend, engine = make_engine({"primary": {"error_rate": 1.0, "error_status": 400},
+                                   "fallback": {"error_rate": 1.0, "error_status": 400}})
+    with pytest.raises(Exception) as raised:
+        asyncio.run(engine.generate_todo("s", "Physics"))
+    assert raised.value.status_code == 400
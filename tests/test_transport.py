@@ -0,0 +1,185 @@
+# Retry, circuit breaker and half-open probe behaviour of transport.Transport, against the mock
+# OpenRouter server (real HTTP through the SDK) and the in-process fake clients
+#   python -m pytest tests
+import asyncio
+import os
+import sys
+
+import openai
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_openai import FakeBackend
+from mock_openrouter import MockOpenRouter, TODO_REPLY
+from transport import Transport, RetryPolicy, CircuitBreaker, CircuitOpenError
+
+MESSAGES = [{"role": "user", "content": "Give me a to-do list"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def mock():
+    with MockOpenRouter(latency=0.0, chunk_delay=0.0) as server:
+        yield server
+
+
+def make_transport(base_url, attempts=3, threshold=5, reset=30.0, clock=None, sleep=lambda seconds: None, **kwargs):
+    # Backoff delays go to sleep() instead of being waited out
+    breaker = CircuitBreaker(threshold, reset, clock=clock or Clock())
+    return Transport(base_url, "test-key", retry=RetryPolicy(attempts, 0.01, 5.0), breaker=breaker, sleep=sleep, **kwargs)
+
+
+def test_retry_recovers_after_a_server_error(mock):
+    mock.config.error_rate, mock.config.error_status = 1.0, 503
+
+    def sleep(seconds):
+        mock.config.error_rate = 0.0  # The upstream recovers while we back off
+
+    transport = make_transport(mock.base_url, sleep=sleep)
+    completion = transport.create(model="m", messages=MESSAGES)
+    assert completion.choices[0].message.content == TODO_REPLY
+    assert mock.config.requests == 2
+    assert transport.breaker_for("m").state == "closed" and transport.breaker_for("m").failures == 0
+
+
+def test_rate_limit_honours_retry_after_and_leaves_breaker_closed(mock):
+    mock.config.error_rate, mock.config.error_status, mock.config.retry_after = 1.0, 429, 2
+    sleeps = []
+    transport = make_transport(mock.base_url, attempts=4, threshold=2, sleep=sleeps.append)
+    for _ in range(3):
+        with pytest.raises(openai.RateLimitError):
+            transport.create(model="m", messages=MESSAGES)
+    assert mock.config.requests == 12
+    assert sleeps == [2.0] * 9
+    assert transport.breaker_for("m").state == "closed"
+
+
+def test_retry_after_longer_than_max_delay_is_not_waited(mock):
+    mock.config.error_rate, mock.config.error_status, mock.config.retry_after = 1.0, 429, 60
+    sleeps = []
+    transport = make_transport(mock.base_url, sleep=sleeps.append)
+    with pytest.raises(openai.RateLimitError):
+        transport.create(model="m", messages=MESSAGES)
+    assert mock.config.requests == 1
+    assert sleeps == []
+
+
+def test_client_errors_are_not_retried(mock):
+    mock.config.error_rate, mock.config.error_status = 1.0, 400
+    transport = make_transport(mock.base_url)
+    with pytest.raises(openai.BadRequestError):
+        transport.create(model="m", messages=MESSAGES)
+    assert mock.config.requests == 1
+    assert transport.breaker_for("m").failures == 0
+
+
+def test_breaker_opens_on_server_errors_and_fails_fast(mock):
+    mock.config.error_rate, mock.config.error_status = 1.0, 500
+    transport = make_transport(mock.base_url, attempts=2, threshold=2)
+    with pytest.raises(openai.InternalServerError):
+        transport.create(model="m", messages=MESSAGES)
+    assert transport.breaker_for("m").state == "open"
+    with pytest.raises(CircuitOpenError):
+        transport.create(model="m", messages=MESSAGES)
+    assert mock.config.requests == 2
+
+
+def test_breaker_counts_connection_errors():
+    with MockOpenRouter() as server:
+        base_url = server.base_url  # Nothing listens here once the server has stopped
+    transport = make_transport(base_url, attempts=2, threshold=2)
+    with pytest.raises(openai.APIConnectionError):
+        transport.create(model="m", messages=MESSAGES)
+    assert transport.breaker_for("m").state == "open"
+
+
+def test_half_open_probe_closes_the_breaker(mock):
+    mock.config.error_rate, mock.config.error_status = 1.0, 502
+    clock = Clock()
+    transport = make_transport(mock.base_url, attempts=1, threshold=1, reset=30.0, clock=clock)
+    with pytest.raises(openai.APIStatusError):
+        transport.create(model="m", messages=MESSAGES)
+    clock.now += 10
+    with pytest.raises(CircuitOpenError):
+        transport.create(model="m", messages=MESSAGES)
+    mock.config.error_rate = 0.0
+    clock.now += 25
+    transport.create(model="m", messages=MESSAGES)
+    assert transport.breaker_for("m").state == "closed"
+    assert mock.config.requests == 2
+
+
+def test_failed_half_open_probe_reopens_the_breaker(mock):
+    mock.config.error_rate, mock.config.error_status = 1.0, 503
+    clock = Clock()
+    transport = make_transport(mock.base_url, attempts=1, threshold=1, reset=30.0, clock=clock)
+    with pytest.raises(openai.APIStatusError):
+        transport.create(model="m", messages=MESSAGES)
+    clock.now += 31
+    with pytest.raises(openai.APIStatusError):
+        transport.create(model="m", messages=MESSAGES)
+    assert transport.breaker_for("m").state == "open"
+    assert transport.breaker_for("m").opened_at == clock.now
+    with pytest.raises(CircuitOpenError):
+        transport.create(model="m", messages=MESSAGES)
+    assert mock.config.requests == 2
+
+
+def test_half_open_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 6
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    assert breaker.state == "closed"
+
+
+def test_async_stream_cut_off_counts_as_a_failure():
+    backend = FakeBackend(latency=0.0, drop_rate=1.0)
+    transport = make_transport("fake", threshold=1, client=backend.client(), async_client=backend.async_client())
+
+    async def read():
+        return [chunk async for chunk in transport.astream(model="m", messages=MESSAGES)]
+
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(read())
+    assert transport.breaker_for("m").state == "open"
+
+
+def test_async_rate_limits_retry_without_opening_the_breaker():
+    backend = FakeBackend(latency=0.0, error_rate=1.0, error_status=429)
+    transport = Transport("fake", "test-key", retry=RetryPolicy(3, 0.001, 0.01), breaker=CircuitBreaker(1, 30.0),
+                          client=backend.client(), async_client=backend.async_client())
+    with pytest.raises(openai.APIStatusError) as raised:
+        asyncio.run(transport.acreate(model="m", messages=MESSAGES))
+    assert raised.value.status_code == 429
+    assert backend.calls == 3
+    assert transport.breaker_for("m").state == "closed"
+
+
+def test_breakers_are_per_model(mock):
+    mock.config.error_rate, mock.config.error_status = 1.0, 503
+    transport = make_transport(mock.base_url, attempts=1, threshold=1)
+    with pytest.raises(openai.InternalServerError):
+        transport.create(model="primary", messages=MESSAGES)
+    with pytest.raises(CircuitOpenError):
+        transport.create(model="primary", messages=MESSAGES)
+    mock.config.error_rate = 0.0
+    transport.create(model="fallback", messages=MESSAGES)
+    assert transport.breaker_for("primary").state == "open"
+    assert transport.breaker_for("fallback").state == "closed"
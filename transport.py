@@ -0,0 +1,291 @@
+# Resilient transport for OpenRouter calls
+# - one OpenAI client over an explicitly sized keep-alive connection pool
+# - separate connect/read timeouts (the read timeout applies per chunk, so long streams are fine)
+# - retries with jittered exponential backoff on connection errors, timeouts, 429 and 5xx,
+#   honouring Retry-After when the server sends one (a wait longer than the policy allows isn't
+#   retried at all, since an earlier retry would only be refused again)
+# - a circuit breaker that fails fast for a while after repeated upstream failures. Only connection
+#   errors, timeouts and 5xx count: a 429 means the service is up and answering, just not to us yet.
+#   There is one breaker per model, so a failing model can't block requests to its fallback.
+# The same policy and breakers cover the blocking client (worker threads) and the asyncio client
+# (the engine's event loop).
+# The openai SDK (and httpx under it) is imported when the first client is built, not with this
+# module: it is the biggest single cost of starting the app.
+import asyncio
+import random
+import threading
+import time
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _sdk():
+    import openai
+    return openai
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_in):
+        super().__init__(f"AI service unavailable, retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+def is_retryable(error):
+    # APITimeoutError is a subclass of APIConnectionError
+    if isinstance(error, _sdk().APIConnectionError):
+        return True
+    return getattr(error, "status_code", None) in RETRY_STATUS
+
+
+def is_outage(error):
+    # Errors that suggest the service is down, as opposed to busy (429) or refusing the request
+    if isinstance(error, _sdk().APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and status >= 500
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def describe_error(error):
+    # Short message for the user; the full exception still goes to the log
+    if isinstance(error, CircuitOpenError):
+        return f"The AI service is unavailable right now. Please try again in {error.retry_in:.0f} seconds."
+    openai = _sdk()
+    if isinstance(error, openai.APITimeoutError):
+        return "The AI service took too long to respond. Please try again."
+    if isinstance(error, openai.APIConnectionError):
+        return "Couldn't reach the AI service. Check your connection and try again."
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "The AI service is busy (rate limited). Please try again in a moment."
+    if status is not None and status >= 500:
+        return "The AI service is having problems. Please try again later."
+    return str(error)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts  # Total tries, including the first
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        # "Full jitter": uniform over [0, base * 2^attempt], so clients that failed together don't retry together
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+        return backoff
+
+
+class CircuitBreaker:
+    # closed: calls go through. After failure_threshold consecutive failures it opens and every call
+    # fails fast for reset_timeout seconds. Then it is half-open: one probe call is let through, and
+    # its result closes the breaker again or re-opens it.
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def copy(self):
+        # A new, closed breaker with the same settings
+        return CircuitBreaker(self.failure_threshold, self.reset_timeout, self.clock)
+
+    def before_call(self):
+        # Raises CircuitOpenError instead of letting the call through
+        with self.lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return
+            raise CircuitOpenError(max(remaining, 1.0))
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def record_cancelled(self):
+        # A call abandoned by its caller (e.g. a hedged request that lost) says nothing about the
+        # upstream, but must not keep the half-open probe slot
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+            self.probing = False
+
+
+class Transport:
+    def __init__(self, base_url, api_key, pool_size=4, connect_timeout=10.0, read_timeout=60.0,
+                 keepalive_expiry=30.0, retry=None, breaker=None, sleep=time.sleep, client=None, async_client=None):
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()  # Settings for the per-model breakers
+        self.breakers = {}  # {model: CircuitBreaker}, created on first use
+        self.sleep = sleep
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_expiry = keepalive_expiry
+        # client/async_client replace the SDK clients (e.g. benchmarks/fake_openai.py); otherwise
+        # they are built on first use
+        self._client = client
+        self._async_client = async_client
+        self.lock = threading.Lock()
+
+    def _client_options(self):
+        import httpx
+        limits = httpx.Limits(
+            max_connections=self.pool_size,
+            max_keepalive_connections=self.pool_size,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        # The SDK's own retries are off; call() does them so they share the breaker
+        return {
+            "base_url": self.base_url,
+            "api_key": self.api_key,
+            "max_retries": 0,
+            "timeout": httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+        }, limits
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self.lock:
+                if self._client is None:
+                    openai = _sdk()
+                    options, limits = self._client_options()
+                    self._client = openai.OpenAI(http_client=openai.DefaultHttpxClient(limits=limits), **options)
+        return self._client
+
+    @property
+    def async_client(self):
+        # Separate from the blocking client, so a blocking-only caller never opens an async connection pool
+        if self._async_client is None:
+            with self.lock:
+                if self._async_client is None:
+                    openai = _sdk()
+                    options, limits = self._client_options()
+                    self._async_client = openai.AsyncOpenAI(http_client=openai.DefaultAsyncHttpxClient(limits=limits), **options)
+        return self._async_client
+
+    def warm_up(self):
+        # Imports the SDK and builds the asyncio client, which every engine request goes through,
+        # ahead of the first request, e.g. from a background thread once the window is up. The
+        # blocking client is left until something calls create() or stream().
+        return self.async_client
+
+    def breaker_for(self, model):
+        breaker = self.breakers.get(model)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.setdefault(model, self.breaker.copy())
+        return breaker
+
+    def _failed(self, breaker, error, attempt):
+        # Books a failed attempt; returns the delay before the next try, or re-raises when giving up
+        if is_outage(error):
+            breaker.record_failure()
+        else:
+            # The upstream answered (rate limit, bad request, auth, ...), so it isn't down
+            breaker.record_success()
+        if not is_retryable(error) or attempt >= self.retry.max_attempts:
+            raise error
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None and retry_after > self.retry.max_delay:
+            raise error
+        return self.retry.delay(attempt - 1, retry_after)
+
+    def call(self, fn, model=None):
+        # Runs fn() under the retry policy and model's breaker
+        breaker = self.breaker_for(model)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                result = fn()
+            except Exception as e:
+                attempt += 1
+                self.sleep(self._failed(breaker, e, attempt))
+                continue
+            breaker.record_success()
+            return result
+
+    async def acall(self, fn, model=None):
+        # fn() returns an awaitable; same policy as call()
+        breaker = self.breaker_for(model)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                breaker.record_cancelled()
+                raise
+            except Exception as e:
+                attempt += 1
+                await asyncio.sleep(self._failed(breaker, e, attempt))
+                continue
+            breaker.record_success()
+            return result
+
+    def create(self, **kwargs):
+        return self.call(lambda: self.client.chat.completions.create(**kwargs), kwargs.get("model"))
+
+    def stream(self, **kwargs):
+        # Retries cover opening the stream; once chunks have been handed out a failure is final,
+        # since the caller has already shown them
+        stream = self.create(stream=True, **kwargs)
+        try:
+            for chunk in stream:
+                yield chunk
+        except Exception as e:
+            if is_outage(e):
+                self.breaker_for(kwargs.get("model")).record_failure()
+            raise
+        finally:
+            # Also runs when the caller stops early, so the connection goes back to the pool
+            stream.close()
+
+    async def acreate(self, **kwargs):
+        return await self.acall(lambda: self.async_client.chat.completions.create(**kwargs), kwargs.get("model"))
+
+    async def astream(self, **kwargs):
+        stream = await self.acreate(stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            if is_outage(e):
+                self.breaker_for(kwargs.get("model")).record_failure()
+            raise
+        finally:
+            await stream.close()
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()